@@ -0,0 +1,165 @@
+"""Nearest-neighbor backends over dense, L2-normalized book embeddings.
+
+Every backend exposes ``search(queries, k, exclude=None) -> (ids, scores)`` with the
+same shapes and ordering, so the exact and approximate paths are interchangeable
+and can be measured against each other with ``recall_report``. An ``IVFIndex`` is
+saved with the model artifact (centroids and bucket layout), so serving processes
+load it instead of re-running k-means.
+"""
+import time
+
+import numpy as np
+
+from catalogue_index import load_arrays, save_arrays
+from recommender import top_n
+
+
+class ExactIndex:
+    """Brute-force cosine search: one matrix product against every book"""
+
+    def __init__(self, embeddings):
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    def search(self, queries, k=5, exclude=None):
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        return top_n(queries @ self.embeddings.T, k, exclude=exclude)
+
+
+def _spherical_kmeans(vectors, n_lists, n_iter, rng):
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    for _ in range(n_iter):
+        assignment = _assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = ~sums.any(axis=1)
+        sums[empty] = vectors[rng.choice(len(vectors), empty.sum(), replace=False)]
+        centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True)
+    return centroids.astype(np.float32)
+
+
+def _assign(vectors, centroids, chunk_size=65536):
+    assignment = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk_size):
+        assignment[start:start + chunk_size] = np.argmax(vectors[start:start + chunk_size] @ centroids.T, axis=1)
+    return assignment
+
+
+class IVFIndex:
+    """Inverted-file index: books are bucketed by their nearest k-means centroid.
+
+    A query scores the ``n_lists`` centroids, then only the books in the ``n_probe``
+    closest buckets. ``n_probe`` is the recall/speed knob: 1 is fastest, ``n_lists``
+    is exact. Vectors are stored grouped by bucket so probing a bucket is a slice.
+    """
+
+    def __init__(self, embeddings, n_lists=None, n_probe=8, n_iter=10, sample_size=100000, seed=0):
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        rng = np.random.default_rng(seed)
+        n_lists = n_lists or max(1, int(np.sqrt(len(embeddings))))
+        n_lists = min(n_lists, len(embeddings))
+
+        sample = embeddings
+        if len(embeddings) > sample_size:
+            sample = embeddings[rng.choice(len(embeddings), sample_size, replace=False)]
+        self.centroids = _spherical_kmeans(sample, n_lists, n_iter, rng)
+        self.n_probe = n_probe
+
+        self._layout(embeddings, _assign(embeddings, self.centroids))
+
+    def _layout(self, embeddings, assignment):
+        order = np.argsort(assignment, kind='stable')
+        self.ids = order.astype(np.int32)
+        self.vectors = embeddings[order]
+        self.offsets = np.searchsorted(assignment[order], np.arange(len(self.centroids) + 1)).astype(np.int64)
+
+    def save(self, path, prefix='ivf'):
+        save_arrays(path, prefix, centroids=self.centroids, ids=self.ids, offsets=self.offsets)
+
+    @classmethod
+    def load(cls, path, embeddings, n_probe=8, prefix='ivf'):
+        """An index written by ``save`` over the same ``embeddings``; no k-means is run"""
+        index = cls.__new__(cls)
+        index.centroids, index.ids, index.offsets = load_arrays(path, prefix, ('centroids', 'ids', 'offsets'))
+        index.n_probe = n_probe
+        # Bucket-ordered copy of the vectors so probing a bucket stays a contiguous slice
+        index.vectors = np.asarray(embeddings, dtype=np.float32)[index.ids]
+        return index
+
+    def extended(self, embeddings):
+        """A new index over ``embeddings``, whose leading rows are the ones indexed now.
+
+        The extra rows are assigned to the existing centroids; k-means is not re-run.
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        assignment = np.empty(len(embeddings), dtype=np.int32)
+        assignment[self.ids] = np.repeat(np.arange(len(self.centroids), dtype=np.int32), np.diff(self.offsets))
+        n_old = len(self.ids)
+        assignment[n_old:] = _assign(embeddings[n_old:], self.centroids)
+        index = type(self).__new__(type(self))
+        index.centroids = self.centroids
+        index.n_probe = self.n_probe
+        index._layout(embeddings, assignment)
+        return index
+
+    def search(self, queries, k=5, exclude=None, n_probe=None):
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        exclude = None if exclude is None else np.asarray(exclude).reshape(-1)
+        probes, _ = top_n(queries @ self.centroids.T, n_probe)
+
+        result_ids = np.full((len(queries), k), -1, dtype=np.int32)
+        result_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for q, lists in enumerate(probes):
+            slices = [slice(self.offsets[i], self.offsets[i + 1]) for i in lists]
+            candidate_ids = np.concatenate([self.ids[s] for s in slices])
+            scores = np.concatenate([self.vectors[s] for s in slices]) @ queries[q]
+            if exclude is not None:
+                scores[candidate_ids == exclude[q]] = -np.inf
+            best, best_scores = top_n(scores, k)
+            found = np.isfinite(best_scores)
+            result_ids[q, :found.sum()] = candidate_ids[best[found]]
+            result_scores[q, :found.sum()] = best_scores[found]
+        return result_ids, result_scores
+
+
+BACKENDS = {
+    'exact': ExactIndex,
+    'ivf': IVFIndex,
+}
+
+
+def build_ann_index(embeddings, backend='ivf', **params):
+    """Build a nearest-neighbor index by backend name (see ``BACKENDS``)"""
+    return BACKENDS[backend](embeddings, **params)
+
+
+def recall_report(index, embeddings, query_rows, k=10, exact=None, **search_params):
+    """Recall@k of ``index`` against exact search, plus per-query latency of both paths.
+
+    ``search_params`` (e.g. ``n_probe``) are passed to the approximate index only.
+    """
+    exact = exact or ExactIndex(embeddings)
+    query_rows = np.asarray(query_rows)
+    queries = np.asarray(embeddings[query_rows], dtype=np.float32)
+
+    def timed(search_index, **params):
+        ids, latencies = [], []
+        for row, query in zip(query_rows, queries):
+            start = time.perf_counter()
+            found, _ = search_index.search(query, k, exclude=[row], **params)
+            latencies.append(time.perf_counter() - start)
+            ids.append(found[0])
+        return ids, np.array(latencies) * 1000
+
+    approx_ids, approx_ms = timed(index, **search_params)
+    exact_ids, exact_ms = timed(exact)
+    hits = sum(len(set(a.tolist()) & set(e.tolist())) for a, e in zip(approx_ids, exact_ids))
+    return {
+        'k': k,
+        'queries': len(query_rows),
+        'recall': hits / (k * len(query_rows)) if len(query_rows) else 0.0,
+        'ann_p50_ms': float(np.percentile(approx_ms, 50)),
+        'ann_p99_ms': float(np.percentile(approx_ms, 99)),
+        'exact_p50_ms': float(np.percentile(exact_ms, 50)),
+        'exact_p99_ms': float(np.percentile(exact_ms, 99)),
+    }
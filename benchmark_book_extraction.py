@@ -0,0 +1,132 @@
+"""Micro-benchmark of book-page field extraction on stored sample pages.
+
+Runs the BeautifulSoup extractors from ``data_scraper.py`` (``html.parser`` plus
+``parse_book_page``) and the single-parse lxml engine in ``book_extractor.py`` over
+the same pages. For each, it reports per-page parse time, per-field hit rates and how
+often the two agree:
+
+    python benchmark_book_extraction.py --pages tests/pages/
+    python benchmark_book_extraction.py --synthetic 100
+
+``tests/pages`` holds sample pages in both layouts. Generated pages alternate
+between the current layout (JSON-LD and ``__NEXT_DATA__`` plus markup) and the
+legacy markup-only layout; like real series books, some carry a series suffix in
+JSON-LD ``name`` and ``titleComplete`` that the heading does not.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import time
+
+from bs4 import BeautifulSoup
+
+from book_extractor import extract_book
+from data_scraper import parse_book_page
+
+FIELDS = ['title', 'author', 'rating', 'rating_count', 'description', 'genres']
+WORDS = "the a of and to in his her war love city night secret house family world life time".split()
+
+
+def synthetic_page(seed):
+    rng = random.Random(seed)
+    title = " ".join(rng.choice(WORDS).title() for _ in range(rng.randint(2, 5)))
+    author = f"Author {rng.randint(1, 5000)}"
+    rating = round(rng.uniform(3, 4.9), 2)
+    count = rng.randint(10, 2_000_000)
+    description = " ".join(rng.choice(WORDS) for _ in range(rng.randint(80, 300)))
+    genres = rng.sample(["Fantasy", "Fiction", "Romance", "Mystery", "Classics", "History", "Thriller"], 5)
+    review_noise = "".join(f'<div class="ReviewCard"><span>{" ".join(rng.choice(WORDS) for _ in range(60))}</span></div>'
+                           for _ in range(30))
+
+    if seed % 2:
+        return (
+            f'<html><body><h1 id="bookTitle">{title}</h1><a class="authorName" href="/author/1"><span>{author}</span></a>'
+            f'<span itemprop="ratingValue">{rating}</span><meta itemprop="ratingCount" content="{count}">'
+            f'<div id="description"><span>{description[:200]}...</span><span style="display:none">{description}</span></div>'
+            + "".join(f'<a class="actionLinkLite bookPageGenreLink" href="/genres/{g}">{g}</a>' for g in genres)
+            + review_noise + '</body></html>'
+        )
+
+    title_complete = f"{title} ({rng.choice(WORDS).title()} Saga, #{rng.randint(1, 9)})" if seed % 4 == 0 else title
+    json_ld = {"@context": "https://schema.org", "@type": "Book", "name": title_complete,
+               "author": [{"@type": "Person", "name": author}],
+               "aggregateRating": {"@type": "AggregateRating", "ratingValue": rating, "ratingCount": count}}
+    apollo = {
+        "Book:kca://book/1": {
+            "title": title, "titleComplete": title_complete,
+            'description({"stripped":true})': description, "description": f"<b>{description}</b>",
+            "bookGenres": [{"genre": {"name": g}} for g in genres],
+            "primaryContributorEdge": {"node": {"__ref": "Contributor:kca://author/1"}},
+            "work": {"__ref": "Work:kca://work/1"},
+        },
+        "Contributor:kca://author/1": {"name": author},
+        "Work:kca://work/1": {"stats": {"averageRating": rating, "ratingsCount": count}},
+    }
+    next_data = {"props": {"pageProps": {"apolloState": apollo}}}
+    return (
+        f'<html><head><script type="application/ld+json">{json.dumps(json_ld)}</script></head><body>'
+        f'<h1 data-testid="bookTitle">{title}</h1><span data-testid="name">{author}</span>'
+        f'<div class="RatingStatistics__rating">{rating}</div>'
+        f'<span data-testid="ratingsCount">{count:,} ratings</span>'
+        f'<div data-testid="description"><span class="Formatted">{description}</span></div>'
+        f'<div data-testid="genresList">' + "".join(f'<a href="/genres/{g}"><span>{g}</span></a>' for g in genres) + '</div>'
+        + review_noise
+        + f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(next_data)}</script></body></html>'
+    )
+
+
+def load_pages(args):
+    if args.pages:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(args.pages, '*.html'))):
+            with open(path, encoding='utf-8', errors='replace') as f:
+                pages.append(f.read())
+        return pages
+    return [synthetic_page(seed) for seed in range(args.synthetic)]
+
+
+def run(extract, pages, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records = [extract(html) for html in pages]
+        best = min(best, time.perf_counter() - start)
+    return records, best * 1000 / len(pages)
+
+
+def engine_record(html):
+    record = extract_book(html)
+    return record.as_dict() if record else None
+
+
+def hit_rate(records, field):
+    return sum(1 for record in records if record and record.get(field) not in (None, '')) / len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark book-page field extraction")
+    parser.add_argument('--pages', help="directory of saved .html book pages")
+    parser.add_argument('--synthetic', type=int, default=100, help="generated pages to use when --pages is not given")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_pages(args)
+    if not pages:
+        parser.error(f"no .html pages in {args.pages}")
+
+    old, old_ms = run(lambda html: parse_book_page(BeautifulSoup(html, 'html.parser')), pages, args.repeat)
+    new, new_ms = run(engine_record, pages, args.repeat)
+
+    print(f"Pages: {len(pages)}  ({'saved' if args.pages else 'synthetic'})")
+    print(f"{'':18} {'bs4 + selectors':>16} {'lxml engine':>12} {'agree':>8}")
+    print(f"{'ms/page':18} {old_ms:16.3f} {new_ms:12.3f}")
+    for field in FIELDS:
+        agree = sum(1 for a, b in zip(old, new) if a and b and a.get(field) == b.get(field)) / len(pages)
+        print(f"{field + ' hits':18} {hit_rate(old, field):16.1%} {hit_rate(new, field):12.1%} {agree:8.1%}")
+    print(f"Speedup: {old_ms / new_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Benchmark book-link extraction on saved listing pages.
+
+Compares the per-element approach ``url_scraper.py`` used to take (four CSS
+selectors, then ``href`` read from every matched element) with the single regex
+pass in ``link_extractor.py``. Without a live browser the old approach is replayed
+on a BeautifulSoup DOM; its WebDriver cost is reported as the number of round trips
+it would make (one per ``find_elements`` call and one per element), optionally
+converted to time with ``--round-trip-ms``.
+
+    python benchmark_link_extraction.py --pages saved_shelf_pages/
+    python benchmark_link_extraction.py --synthetic 50
+"""
+import argparse
+import glob
+import os
+import random
+import time
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+from link_extractor import SITE_URL, extract_book_links
+
+OLD_SELECTORS = ['a[href*="/book/show/"]', 'a[href*="/book/"]', '.bookTitle', '.bookCover a']
+
+
+def selector_links(html, base_url=SITE_URL):
+    """The old find_elements/get_attribute loop replayed on a parsed DOM.
+    Returns (links, WebDriver round trips it would have cost)."""
+    soup = BeautifulSoup(html, 'html.parser')
+    links = []
+    round_trips = 0
+    for selector in OLD_SELECTORS:
+        elements = soup.select(selector)
+        round_trips += 1 + len(elements)
+        for element in elements:
+            url = element.get('href')
+            if url and '/book/show/' in url:
+                links.append(urljoin(base_url, url).split('?')[0].split('#')[0])
+    return list(dict.fromkeys(links)), round_trips
+
+
+def synthetic_page(seed, books=50):
+    """Shelf-like HTML: cover and title anchors per book plus author and navigation noise"""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(books):
+        book_id = rng.randint(1, 10**7)
+        slug = f"{book_id}.Book_{rng.randint(0, 999)}"
+        rows.append(
+            f'<div class="elementList"><a class="leftAlignedImage bookCover" href="/book/show/{slug}?from_search=true">'
+            f'<img src="cover.jpg"></a><a class="bookTitle" href="/book/show/{slug}">Book {book_id}</a>'
+            f'<span class="bookTitle">(Series #{rng.randint(1, 9)})</span>'
+            f'<a class="authorName" href="/author/show/{rng.randint(1, 10**6)}">Author</a>'
+            f'<span class="greyText smallText">avg rating 4.{rng.randint(0, 99)}</span></div>'
+        )
+    nav = ''.join(f'<a href="/shelf/show/fantasy?page={p}">{p}</a>' for p in range(1, 10))
+    return f'<html><head><title>Shelf</title></head><body>{nav}{"".join(rows)}{nav}</body></html>'
+
+
+def load_pages(args):
+    if args.pages:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(args.pages, '*.html'))):
+            with open(path, encoding='utf-8', errors='replace') as f:
+                pages.append(f.read())
+        return pages
+    return [synthetic_page(seed) for seed in range(args.synthetic)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark book-link extraction on saved listing pages")
+    parser.add_argument('--pages', help="directory of saved .html listing pages")
+    parser.add_argument('--synthetic', type=int, default=50, help="generated pages to use when --pages is not given")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--round-trip-ms', type=float, default=0.0,
+                        help="assumed WebDriver round-trip latency, to estimate the old approach's browser cost")
+    args = parser.parse_args()
+
+    pages = load_pages(args)
+    if not pages:
+        parser.error(f"no .html pages in {args.pages}")
+
+    timings = {'selectors': [], 'regex': []}
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        old = [selector_links(html) for html in pages]
+        timings['selectors'].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        new = [extract_book_links(html) for html in pages]
+        timings['regex'].append(time.perf_counter() - start)
+
+    round_trips = sum(trips for _, trips in old)
+    matching = sum(set(links) == set(regex_links) for (links, _), regex_links in zip(old, new))
+    old_ms = min(timings['selectors']) * 1000 / len(pages)
+    new_ms = min(timings['regex']) * 1000 / len(pages)
+
+    print(f"Pages: {len(pages)}  ({'saved' if args.pages else 'synthetic'})")
+    print(f"Links per page (regex): {sum(map(len, new)) / len(pages):.1f}")
+    print(f"Identical link sets: {matching}/{len(pages)}")
+    print(f"{'approach':12} {'ms/page':>10} {'round trips/page':>18}")
+    print(f"{'selectors':12} {old_ms:10.3f} {round_trips / len(pages):18.1f}")
+    print(f"{'regex':12} {new_ms:10.3f} {1:18.1f}")
+    print(f"Parse speedup: {old_ms / new_ms:.1f}x")
+    if args.round_trip_ms:
+        browser_ms = round_trips / len(pages) * args.round_trip_ms
+        print(f"Estimated WebDriver time/page: selectors {browser_ms:.1f} ms vs one page_source call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Benchmark the recommendation pipeline at several catalogue sizes.
+
+Each stage is timed and its peak RSS recorded; query latency percentiles are
+measured for single and batched requests. Results are written as JSON so two runs
+(e.g. before and after a change) can be compared:
+
+    python benchmark_recommender.py --sizes 10000 50000 --output bench_new.json
+    python benchmark_recommender.py --sizes 10000 50000 --compare bench_old.json
+
+Catalogues are synthetic (Zipf-distributed vocabulary) unless ``--dataset`` points at
+``Books_dataset.csv``, in which case they are sampled from its real Tags.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import threading
+import time
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from recommender import build_topk_index, similar_rows, topk_for_rows
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [10000, 50000, 200000, 1000000]
+
+
+def current_rss_mb():
+    """Resident set size of this process from /proc (Linux); 0 where unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        return 0.0
+
+
+class PeakRSS:
+    """Samples RSS on a background thread while a stage runs"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_mb = current_rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+
+def synthetic_tags(n_books, vocabulary_size=30000, mean_length=120, seed=0):
+    """Tags-like documents with a Zipfian word distribution, like real descriptions"""
+    rng = np.random.default_rng(seed)
+    words = np.array([f'w{i}' for i in range(vocabulary_size)])
+    lengths = rng.poisson(mean_length, n_books).clip(5)
+    word_ids = (rng.zipf(1.3, lengths.sum()) - 1) % vocabulary_size
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    return [" ".join(words[word_ids[offsets[i]:offsets[i + 1]]]) for i in range(n_books)]
+
+
+def sampled_tags(dataset, n_books, seed=0):
+    """Tags sampled (with replacement past the dataset size) from the real catalogue"""
+    from preprocessing import load_tag_frame
+
+    tags = load_tag_frame(dataset)["Tags"].to_numpy()
+    rng = np.random.default_rng(seed)
+    return tags[rng.choice(len(tags), n_books, replace=n_books > len(tags))].tolist()
+
+
+def run_stage(results, size, stage, func):
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        value = func()
+        seconds = time.perf_counter() - start
+    results.append({'size': size, 'stage': stage, 'seconds': seconds, 'peak_rss_mb': rss.peak_mb})
+    logger.info(f"⏱️ {size:>8} {stage:28} {seconds:8.3f}s  peak RSS {rss.peak_mb:8.1f} MB")
+    return value
+
+
+def latency_percentiles(func, queries):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        func(query)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+    return {f'p{q}_ms': float(np.percentile(latencies, q)) for q in (50, 90, 99)}
+
+
+def benchmark_size(size, args):
+    results = []
+    tags = run_stage(results, size, 'build_catalogue', lambda: (
+        sampled_tags(args.dataset, size, args.seed) if args.dataset else synthetic_tags(size, seed=args.seed)
+    ))
+    tfidf = TfidfVectorizer(stop_words='english', ngram_range=(1, 2), max_df=0.8, min_df=2)
+    tfidf_matrix = run_stage(results, size, 'tfidf_fit_transform', lambda: tfidf.fit_transform(tags))
+    del tags
+
+    if size <= args.dense_limit:
+        similarity = run_stage(results, size, 'cosine_similarity_sparse',
+                               lambda: cosine_similarity(tfidf_matrix, dense_output=False))
+        run_stage(results, size, 'toarray', similarity.toarray)
+        del similarity
+    else:
+        logger.info(f"⏭️ Skipping dense N x N stages for {size} books (over --dense-limit)")
+
+    neighbor_ids, _ = run_stage(results, size, 'build_topk_index',
+                                lambda: build_topk_index(tfidf_matrix, k=args.k, block_size=args.block_size))
+
+    rng = np.random.default_rng(args.seed)
+    queries = rng.choice(size, args.queries, replace=size < args.queries)
+    latency = {
+        'size': size,
+        'recommendation_lookup': latency_percentiles(lambda row: neighbor_ids[row, :5], queries),
+        'recommend_books_single': latency_percentiles(lambda row: similar_rows(tfidf_matrix, [row], 5), queries),
+    }
+    batches = [rng.choice(size, args.batch_size, replace=size < args.batch_size) for _ in range(args.batches)]
+    run_stage(results, size, f'recommend_batch_{args.batch_size}', lambda: topk_for_rows(tfidf_matrix, batches[0], 5))
+    batch_latency = latency_percentiles(lambda batch: topk_for_rows(tfidf_matrix, batch, 5), batches)
+    latency[f'recommend_batch_{args.batch_size}'] = batch_latency
+    latency['recommend_batch_per_query_ms'] = batch_latency['p50_ms'] / args.batch_size
+    return results, latency
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(new, old):
+    """Print per-stage time and memory ratios of ``new`` vs ``old`` result files"""
+    old_stages = {(r['size'], r['stage']): r for r in old['stages']}
+    print(f"{'size':>8} {'stage':28} {'time x':>8} {'rss x':>8}")
+    for r in new['stages']:
+        before = old_stages.get((r['size'], r['stage']))
+        if before and before['seconds'] and before['peak_rss_mb']:
+            print(f"{r['size']:>8} {r['stage']:28} {r['seconds'] / before['seconds']:8.2f} "
+                  f"{r['peak_rss_mb'] / before['peak_rss_mb']:8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation pipeline")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--dataset', help="sample real Tags from Books_dataset.csv instead of synthetic ones")
+    parser.add_argument('--queries', type=int, default=200, help="single queries per latency measurement")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--batches', type=int, default=20, help="batches per batch latency measurement")
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--block-size', type=int, default=1024)
+    parser.add_argument('--dense-limit', type=int, default=20000,
+                        help="largest catalogue for the legacy full cosine_similarity/toarray stages")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help="previous results file to compare against")
+    args = parser.parse_args()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'args': vars(args),
+        },
+        'stages': [],
+        'latency': [],
+    }
+    for size in args.sizes:
+        logger.info(f"📚 Benchmarking catalogue of {size} books")
+        stages, latency = benchmark_size(size, args)
+        report['stages'].extend(stages)
+        report['latency'].append(latency)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"💾 Saved results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Single-parse field extraction for Goodreads book pages.
+
+The page is parsed once with lxml. The title comes from the page heading, as it
+always has, or from the Apollo ``title`` when there is none; JSON-LD ``name`` and
+``titleComplete`` carry a series suffix ("Twilight (The Twilight Saga, #1)") that
+would stop scraped titles matching the catalogue. The other fields are read from
+structured data first: the schema.org JSON-LD block (author, rating, rating count)
+and the Next.js ``__NEXT_DATA__`` payload (description, genres, and the same fields
+again). Only fields still missing fall back to a table of precompiled XPath
+expressions, tried in order. The result is a ``BookRecord``; ``as_dict()`` gives the
+dict ``data_scraper.py`` has always produced.
+"""
+import json
+import re
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+import lxml.html
+from lxml import etree
+
+MAX_GENRES = 5
+
+NUMBER = re.compile(r'(\d+(?:\.\d+)?)')
+RATING_COUNT = re.compile(r'([\d,]+)\s*rating')
+
+JSON_LD = etree.XPath('//script[@type="application/ld+json"]/text()')
+NEXT_DATA = etree.XPath('//script[@id="__NEXT_DATA__"]/text()')
+
+XPATHS = {
+    'title': [etree.XPath(x) for x in (
+        '//h1[@data-testid="bookTitle"]',
+        '//h1[@id="bookTitle"]',
+        '//h1',
+    )],
+    'author': [etree.XPath(x) for x in (
+        '//*[@data-testid="name"]',
+        '//*[contains(concat(" ", normalize-space(@class), " "), " authorName ")]',
+    )],
+    'rating': [etree.XPath(x) for x in (
+        '//*[contains(@class, "RatingStatistics__rating")]',
+        '//*[@itemprop="ratingValue"]',
+        '//*[contains(concat(" ", normalize-space(@class), " "), " average ")]',
+    )],
+    'rating_count': [etree.XPath(x) for x in (
+        '//meta[@itemprop="ratingCount"]/@content',
+        '//*[@data-testid="ratingsCount"]',
+        '//*[@data-testid="reviewHeader"]',
+    )],
+    'description': [etree.XPath(x) for x in (
+        '//*[@data-testid="description"]//span',
+        '//*[@id="description"]//span',
+        '//*[@data-testid="description"]',
+        '//*[@id="description"]',
+    )],
+    'genres': [etree.XPath(x) for x in (
+        '//*[@data-testid="genresList"]//a',
+        '//a[contains(@class, "bookPageGenreLink")]',
+    )],
+}
+
+
+@dataclass
+class BookRecord:
+    title: str
+    author: str
+    rating: Optional[float] = None
+    rating_count: Optional[int] = None
+    description: Optional[str] = None
+    genres: Optional[str] = None
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def _text(node):
+    return (node if isinstance(node, str) else node.text_content()).strip()
+
+
+def _html_text(value):
+    """Plain text of an HTML fragment such as the description in __NEXT_DATA__"""
+    return lxml.html.fromstring(value).text_content().strip() if '<' in value else value.strip()
+
+
+def _rating(value):
+    match = NUMBER.search(str(value))
+    if match:
+        rating = float(match.group(1))
+        if 0 < rating <= 5:
+            return rating
+    return None
+
+
+def _count(value, pattern=NUMBER):
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = pattern.search(value if pattern is RATING_COUNT else value.replace(',', ''))
+    return int(float(match.group(1).replace(',', ''))) if match else None
+
+
+def _put(fields, field, value):
+    """Keep the first non-empty value found for a field"""
+    if value is not None and value != '' and fields.get(field) is None:
+        fields[field] = value
+
+
+def _json_ld(tree, fields):
+    for block in JSON_LD(tree):
+        try:
+            data = json.loads(block)
+        except ValueError:
+            continue
+        if not isinstance(data, dict) or data.get('@type') != 'Book':
+            continue
+        authors = data.get('author')
+        if isinstance(authors, list):
+            authors = authors[0] if authors else None
+        if isinstance(authors, dict):
+            _put(fields, 'author', authors.get('name'))
+        rating = data.get('aggregateRating') or {}
+        if rating.get('ratingValue') is not None:
+            _put(fields, 'rating', _rating(rating['ratingValue']))
+        if rating.get('ratingCount') is not None:
+            _put(fields, 'rating_count', _count(rating['ratingCount']))
+
+
+def _next_data(tree, fields):
+    """Fields from the Apollo cache Goodreads ships in __NEXT_DATA__"""
+    for block in NEXT_DATA(tree):
+        try:
+            state = json.loads(block)['props']['pageProps']['apolloState']
+        except (ValueError, KeyError, TypeError):
+            continue
+        book = next((value for key, value in state.items() if key.startswith('Book:') and value.get('title')), None)
+        if book is None:
+            continue
+        _put(fields, 'title', book.get('title'))
+        description = book.get('description({"stripped":true})') or book.get('description')
+        if description:
+            _put(fields, 'description', _html_text(description))
+        genres = [edge['genre']['name'] for edge in book.get('bookGenres') or [] if edge.get('genre', {}).get('name')]
+        if genres:
+            _put(fields, 'genres', ', '.join(genres[:MAX_GENRES]))
+        contributor = ((book.get('primaryContributorEdge') or {}).get('node') or {}).get('__ref')
+        if contributor in state:
+            _put(fields, 'author', state[contributor].get('name'))
+        work = state.get(((book.get('work') or {}).get('__ref')), {})
+        stats = work.get('stats') or {}
+        if stats.get('averageRating') is not None:
+            _put(fields, 'rating', _rating(stats['averageRating']))
+        if stats.get('ratingsCount') is not None:
+            _put(fields, 'rating_count', _count(stats['ratingsCount']))
+
+
+def _first_text(tree, field):
+    for xpath in XPATHS[field]:
+        for node in xpath(tree):
+            text = _text(node)
+            if text:
+                return text
+    return None
+
+
+def _fallbacks(tree, fields):
+    if not fields.get('author'):
+        _put(fields, 'author', _first_text(tree, 'author'))
+
+    if fields.get('rating') is None:
+        for xpath in XPATHS['rating']:
+            rating = next((r for r in (_rating(_text(node)) for node in xpath(tree)) if r is not None), None)
+            if rating is not None:
+                fields['rating'] = rating
+                break
+
+    if fields.get('rating_count') is None:
+        meta, *text_xpaths = XPATHS['rating_count']
+        values = meta(tree)
+        if values:
+            _put(fields, 'rating_count', _count(values[0]))
+        for xpath in text_xpaths:
+            counts = (_count(_text(node), RATING_COUNT) for node in xpath(tree))
+            _put(fields, 'rating_count', next((c for c in counts if c is not None), None))
+
+    if not fields.get('description'):
+        # The longest candidate is the untruncated text when a page carries both
+        for xpath in XPATHS['description']:
+            texts = [_text(node) for node in xpath(tree)]
+            if any(texts):
+                fields['description'] = max(texts, key=len)
+                break
+
+    if not fields.get('genres'):
+        for xpath in XPATHS['genres']:
+            genres = [_text(node) for node in xpath(tree)][:MAX_GENRES]
+            if genres:
+                fields['genres'] = ', '.join(genres)
+                break
+
+
+def extract_book(html):
+    """BookRecord for a book page's HTML, or None without a title and author"""
+    if not html or not html.strip():
+        return None
+    tree = lxml.html.fromstring(html)
+    fields = {'title': _first_text(tree, 'title')}
+    _json_ld(tree, fields)
+    _next_data(tree, fields)
+    _fallbacks(tree, fields)
+    if not (fields.get('title') and fields.get('author')):
+        return None
+    return BookRecord(**fields)
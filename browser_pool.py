@@ -0,0 +1,139 @@
+"""Long-lived pool of Selenium browsers shared by the scrapers.
+
+ChromeDriver is resolved once per process instead of once per browser, browsers are
+handed out with ``checkout``/``checkin`` (or the ``browser()`` context manager) and
+kept across batches. A browser is replaced after ``max_pages`` pages, or as soon as
+it fails a health check, and ``run`` retries the in-flight URL on a fresh browser
+instead of losing it.
+"""
+import functools
+import logging
+import queue
+from contextlib import contextmanager
+from threading import Condition
+
+from selenium.common.exceptions import WebDriverException
+from webdriver_manager.chrome import ChromeDriverManager
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=None)
+def driver_path():
+    """ChromeDriver binary path, downloaded or looked up once per process"""
+    return ChromeDriverManager().install()
+
+
+def is_healthy(browser):
+    """True if the browser session still answers WebDriver commands"""
+    try:
+        browser.execute_script("return 1")
+        return True
+    except WebDriverException:
+        return False
+
+
+class BrowserPool:
+    """At most ``size`` browsers created by ``factory()``, reused until worn out or broken"""
+
+    def __init__(self, factory, size=4, max_pages=200):
+        self.factory = factory
+        self.size = size
+        self.max_pages = max_pages
+        self.stats = {'launched': 0, 'recycled': 0, 'crashes': 0, 'requeued': 0}
+        self._idle = []
+        self._pages = {}
+        self._launching = 0
+        self._available = Condition()
+
+    def _has_slot(self):
+        return len(self._pages) + self._launching < self.size
+
+    def checkout(self, timeout=None):
+        """An idle browser, a newly launched one if a slot is free, or wait for either.
+        Raises ``queue.Empty`` if neither turns up within ``timeout`` seconds."""
+        with self._available:
+            if not self._available.wait_for(lambda: self._idle or self._has_slot(), timeout):
+                raise queue.Empty
+            if self._idle:
+                return self._idle.pop()
+            self._launching += 1
+        try:
+            browser = self.factory()
+        except BaseException:
+            with self._available:
+                self._launching -= 1
+                self._available.notify()
+            raise
+        with self._available:
+            self._launching -= 1
+            self._pages[browser] = 0
+            self.stats['launched'] += 1
+        return browser
+
+    def checkin(self, browser, pages=0, broken=False):
+        """Return a browser after ``pages`` page loads; broken or worn-out ones are replaced"""
+        with self._available:
+            self._pages[browser] += pages
+            worn_out = self._pages[browser] >= self.max_pages
+        if broken or worn_out or not is_healthy(browser):
+            self._discard(browser, crashed=broken or not worn_out)
+        else:
+            with self._available:
+                self._idle.append(browser)
+                self._available.notify()
+
+    def _discard(self, browser, crashed):
+        # Free the slot first so a waiting checkout can launch the replacement
+        with self._available:
+            del self._pages[browser]
+            self.stats['crashes' if crashed else 'recycled'] += 1
+            self._available.notify()
+        try:
+            browser.quit()
+        except Exception:
+            pass
+        logger.info(f"♻️ {'Replacing crashed' if crashed else 'Recycling'} browser")
+
+    @contextmanager
+    def browser(self):
+        """Check out a browser for a block of work, e.g. one genre crawl"""
+        browser = self.checkout()
+        broken = False
+        try:
+            yield browser
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self.checkin(browser, broken=broken)
+
+    def run(self, func, url, retries=1):
+        """``func(browser, url)`` on a pooled browser, retried on a fresh one if the browser dies"""
+        for attempt in range(retries + 1):
+            browser = self.checkout()
+            try:
+                result = func(browser, url)
+            except WebDriverException as e:
+                logger.warning(f"⚠️ Browser failed on {url}: {str(e).splitlines()[0]}")
+                self.checkin(browser, pages=1, broken=True)
+            else:
+                # Scrape functions swallow their own errors; a None from a dead browser is a crash
+                if result is not None or is_healthy(browser):
+                    self.checkin(browser, pages=1)
+                    return result
+                self.checkin(browser, pages=1, broken=True)
+            if attempt < retries:
+                self.stats['requeued'] += 1
+        return None
+
+    def close(self):
+        with self._available:
+            idle, self._idle = self._idle, []
+            for browser in idle:
+                self._pages.pop(browser, None)
+        for browser in idle:
+            try:
+                browser.quit()
+            except Exception:
+                pass
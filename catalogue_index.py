@@ -0,0 +1,165 @@
+import bisect
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_title(title):
+    """Lowercase, strip accents and punctuation, and collapse whitespace"""
+    title = unicodedata.normalize('NFKD', str(title))
+    title = ''.join(ch for ch in title if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(' ', title.lower()).strip()
+
+
+class _PackedStrings:
+    """Read-only sequence of strings stored as one UTF-8 byte array plus offsets"""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def pack(cls, strings):
+        encoded = [string.encode('utf-8') for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(item) for item in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def tolist(self):
+        text = bytes(self.blob)
+        offsets = self.offsets.tolist()
+        return [text[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])]
+
+
+def save_arrays(path, prefix, **arrays):
+    """Write each array as ``<prefix>_<name>.npy`` under ``path``"""
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f'{prefix}_{name}.npy'), np.ascontiguousarray(array))
+
+
+def load_arrays(path, prefix, names, mmap_mode='r'):
+    """Memory-map the arrays ``save_arrays`` wrote, in the order of ``names``"""
+    return [np.load(os.path.join(path, f'{prefix}_{name}.npy'), mmap_mode=mmap_mode) for name in names]
+
+
+class CatalogueIndex:
+    """Title lookup that returns positional row ids into the catalogue arrays.
+
+    Ids are positions (0..n_books-1), so they index ``tfidf_matrix`` rows and
+    ``DataFrame.iloc`` directly regardless of gaps in the DataFrame labels. A title
+    shared by several editions maps to all of them, best ``bbeScore`` first.
+
+    The index is a handful of flat arrays (sorted normalized keys, and each key's rows
+    as a slice of one row array), so ``save`` / ``load`` round-trip it through ``.npy``
+    files that ``load`` memory-maps instead of rebuilding.
+    """
+
+    ARRAYS = ('keys', 'key_offsets', 'rows', 'row_offsets')
+
+    def __init__(self, titles, bbe_scores=None):
+        titles = [str(title) for title in titles]
+        if bbe_scores is None:
+            order = range(len(titles))
+        else:
+            bbe_scores = np.nan_to_num(np.asarray(bbe_scores, dtype=np.float64), nan=-np.inf)
+            order = np.argsort(-bbe_scores, kind='stable').tolist()
+
+        groups = {}
+        for row in order:
+            groups.setdefault(normalize_title(titles[row]), []).append(row)
+        keys = sorted(groups)
+        row_offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum([len(groups[key]) for key in keys], out=row_offsets[1:])
+        rows = np.fromiter((row for key in keys for row in groups[key]), dtype=np.int32, count=len(titles))
+        self._init(titles, _PackedStrings.pack(keys), rows, row_offsets)
+
+    def _init(self, titles, keys, rows, row_offsets):
+        self.titles = titles
+        self._keys = keys
+        self._rows = rows
+        self._row_offsets = row_offsets
+
+    def save(self, path, prefix='catalogue'):
+        save_arrays(path, prefix, keys=self._keys.blob, key_offsets=self._keys.offsets,
+                     rows=self._rows, row_offsets=self._row_offsets)
+
+    @classmethod
+    def load(cls, path, titles, prefix='catalogue', mmap_mode='r'):
+        """Memory-map an index written by ``save`` for the same ``titles``"""
+        blob, key_offsets, rows, row_offsets = load_arrays(path, prefix, cls.ARRAYS, mmap_mode)
+        index = cls.__new__(cls)
+        index._init(titles, _PackedStrings(blob, key_offsets), rows, row_offsets)
+        return index
+
+    def extended(self, titles):
+        """A new index that also covers ``titles``, appended as rows len(self), len(self) + 1, ...
+
+        Appended books have no ``bbeScore`` yet, so they rank after the existing
+        editions of their title, as they would in a full rebuild. Only the new titles
+        are normalized; the existing groups are merged with array operations.
+        """
+        titles = [str(title) for title in titles]
+        old_keys = self._keys.tolist()
+        new_keys = [normalize_title(title) for title in titles]
+        keys = sorted(set(old_keys).union(new_keys))
+        key_ids = {key: i for i, key in enumerate(keys)}
+
+        old_ids = np.repeat(np.array([key_ids[key] for key in old_keys], dtype=np.int64), np.diff(self._row_offsets))
+        new_ids = np.array([key_ids[key] for key in new_keys], dtype=np.int64)
+        group_ids = np.concatenate([old_ids, new_ids])
+        rows = np.concatenate([self._rows, np.arange(len(self), len(self) + len(titles), dtype=np.int32)])
+        order = np.argsort(group_ids, kind='stable')
+        row_offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(group_ids, minlength=len(keys)), out=row_offsets[1:])
+
+        index = type(self).__new__(type(self))
+        index._init(list(self.titles) + titles, _PackedStrings.pack(keys), rows[order], row_offsets)
+        return index
+
+    def __len__(self):
+        return len(self.titles)
+
+    def _position(self, key):
+        position = bisect.bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            return position
+        return None
+
+    def _group(self, position):
+        return self._rows[self._row_offsets[position]:self._row_offsets[position + 1]].tolist()
+
+    def __contains__(self, title):
+        return self._position(normalize_title(title)) is not None
+
+    def lookup(self, title):
+        """All rows for a title (exact match first, then normalized), best edition first"""
+        position = self._position(normalize_title(title))
+        if position is None:
+            raise KeyError(title)
+        rows = self._group(position)
+        exact = [row for row in rows if self.titles[row] == title]
+        return exact or rows
+
+    def row(self, title):
+        """The single best row for a title"""
+        return self.lookup(title)[0]
+
+    def prefix(self, query, limit=10):
+        """Rows whose normalized title starts with the normalized query, in title order"""
+        key = normalize_title(query)
+        rows = []
+        position = bisect.bisect_left(self._keys, key)
+        while position < len(self._keys) and len(rows) < limit and self._keys[position].startswith(key):
+            rows.extend(self._group(position)[:limit - len(rows)])
+            position += 1
+        return rows
@@ -0,0 +1,169 @@
+"""Crawl frontier shared by every genre crawl in url_scraper.py.
+
+A book found on several shelves is collected once, by whichever genre reaches it
+first, and a listing page is loaded at most once per run. Both sets hold 64-bit
+hashes of the URLs (8 bytes per entry on disk) and persist between runs in one
+``.npz`` file. Shelves keep changing, so a saved page only counts as seen for
+``page_ttl`` seconds after it was loaded (by default a day; 0 keeps the page set
+per run); seen books never expire. URLs claimed by a genre only become part of the
+saved state when that genre is committed, so a crawl interrupted mid-genre is
+simply redone.
+
+``crawl`` walks a genre's strategies (pagination, sort orders, search terms) in
+order and drops a strategy as soon as its recent pages stop producing enough new
+books. A few page failures in a row (by default 3, e.g. a browser that died) abort
+the crawl with the last error, so the genre is marked failed and its claims are
+released instead of being committed as complete. ``stats()`` reports the resulting
+page loads per unique book.
+"""
+import hashlib
+import logging
+import os
+import time
+from collections import deque
+from threading import Lock
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def url_hash(url):
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class CrawlFrontier:
+    """Global seen-book and seen-page sets plus a yield-driven strategy planner"""
+
+    def __init__(self, path=None, min_new_per_page=5, window=2, max_failures=3, page_ttl=24 * 3600,
+                 clock=time.time):
+        self.path = path
+        self.min_new_per_page = min_new_per_page
+        self.window = window
+        self.max_failures = max_failures
+        self.page_ttl = page_ttl
+        self.clock = clock
+        self.pages_loaded = 0
+        self.pages_skipped = 0
+        self.books_found = 0
+        self.strategies_dropped = 0
+        self._books = set()
+        # Page hash -> when it was loaded; only pages younger than page_ttl are kept
+        self._pages = {}
+        self._claims = {}
+        self._lock = Lock()
+        if path and os.path.exists(path):
+            with np.load(path) as saved:
+                self._books.update(saved['books'].tolist())
+                # Files written before pages had timestamps have no ages, so their pages are reloaded
+                if self.page_ttl and 'page_times' in saved:
+                    fresh = self.clock() - saved['page_times'] < self.page_ttl
+                    self._pages.update(zip(saved['pages'][fresh].tolist(), saved['page_times'][fresh].tolist()))
+            logger.info(f"📂 Frontier: {len(self._books)} known books, {len(self._pages)} recent pages from {path}")
+
+    def _claim(self, owner):
+        return self._claims.setdefault(owner, (set(), set()))
+
+    def _seen(self, h, which):
+        return h in (self._books if which == 0 else self._pages) or any(
+            h in claim[which] for claim in self._claims.values()
+        )
+
+    def claim_books(self, urls, owner, limit=None):
+        """The URLs not seen before (at most ``limit``), now claimed by ``owner``"""
+        new = []
+        with self._lock:
+            books = self._claim(owner)[0]
+            for url in urls:
+                if limit is not None and len(new) >= limit:
+                    break
+                h = url_hash(url)
+                if not self._seen(h, 0):
+                    books.add(h)
+                    new.append(url)
+            self.books_found += len(new)
+        return new
+
+    def claim_page(self, page_url, owner):
+        """False if the page was already loaded, otherwise claims it for ``owner``"""
+        h = url_hash(page_url)
+        with self._lock:
+            if self._seen(h, 1):
+                self.pages_skipped += 1
+                return False
+            self._claim(owner)[1].add(h)
+            self.pages_loaded += 1
+            return True
+
+    def commit(self, owner):
+        """Make ``owner``'s claims permanent and persist the frontier"""
+        with self._lock:
+            books, pages = self._claims.pop(owner, (set(), set()))
+            self._books |= books
+            self._pages.update(dict.fromkeys(pages, self.clock()))
+            if self.path:
+                # With page_ttl=0 the page set stays in this run only
+                saved_pages = self._pages if self.page_ttl else {}
+                tmp_path = self.path + '.tmp.npz'
+                np.savez(tmp_path,
+                         books=np.fromiter(self._books, dtype=np.uint64, count=len(self._books)),
+                         pages=np.fromiter(saved_pages.keys(), dtype=np.uint64, count=len(saved_pages)),
+                         page_times=np.fromiter(saved_pages.values(), dtype=np.float64, count=len(saved_pages)))
+                os.replace(tmp_path, self.path)
+
+    def release(self, owner):
+        """Drop ``owner``'s claims, e.g. after its crawl failed"""
+        with self._lock:
+            self._claims.pop(owner, None)
+
+    def crawl(self, strategies, fetch_links, owner, target):
+        """Collect up to ``target`` new book URLs for ``owner``.
+
+        ``strategies`` yields (name, page URLs, fetch options); ``fetch_links(page_url,
+        **options)`` loads a page and returns the book URLs on it. A failed page is
+        skipped; ``max_failures`` consecutive failures re-raise the last error.
+        """
+        collected = []
+        failures = 0
+        for name, page_urls, options in strategies:
+            recent = deque(maxlen=self.window)
+            for page_url in page_urls:
+                if len(collected) >= target:
+                    return collected
+                if not self.claim_page(page_url, owner):
+                    continue
+                try:
+                    links = fetch_links(page_url, **options)
+                except Exception as e:
+                    logger.error(f"❌ Error on {page_url}: {str(e)}")
+                    with self._lock:
+                        self._claim(owner)[1].discard(url_hash(page_url))  # let a later attempt load it
+                    failures += 1
+                    if failures >= self.max_failures:
+                        logger.error(f"🛑 {failures} pages failed in a row, abandoning the crawl")
+                        raise
+                    continue
+                failures = 0
+                new = self.claim_books(links, owner, limit=target - len(collected))
+                collected.extend(new)
+                recent.append(len(new))
+                logger.info(f"🔍 {name}: {len(new)} new books from {page_url} - Current: {len(collected)}/{target}")
+
+                if not links:
+                    break  # past the last page
+                if len(recent) == self.window and sum(recent) / self.window < self.min_new_per_page:
+                    self.strategies_dropped += 1
+                    logger.info(f"🔚 Dropping {name}: {list(recent)} new books on its last pages")
+                    break
+        return collected
+
+    def stats(self):
+        """Counts for this run; ``pages_per_unique_book`` is the number to drive down"""
+        return {
+            'pages_loaded': self.pages_loaded,
+            'pages_skipped': self.pages_skipped,
+            'strategies_dropped': self.strategies_dropped,
+            'unique_books': self.books_found,
+            'known_books': len(self._books),
+            'pages_per_unique_book': self.pages_loaded / self.books_found if self.books_found else 0.0,
+        }
@@ -1,18 +1,25 @@
-import random
+import asyncio
 import time
 import pandas as pd
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
+from selenium.common.exceptions import TimeoutException, WebDriverException
 import logging
-import concurrent.futures
+import argparse
+import functools
 from threading import Lock
 import re
+from book_extractor import extract_book
+from browser_pool import BrowserPool, driver_path
+from link_extractor import normalize_book_url
+from output_writer import BOOK_SCHEMA, PartWriter
+from rate_limiter import TokenBucket
+from scrape_state import ScrapeState
+from work_queue import WorkQueue
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -41,41 +48,71 @@ def setup_optimized_driver():
     # Keep JavaScript enabled for complete content loading
     opts.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36")
     
-    service = Service(ChromeDriverManager().install())
+    service = Service(driver_path())
     browser = webdriver.Chrome(service=service, options=opts)
     browser.set_page_load_timeout(20)
-    browser.implicitly_wait(10)
+    # Explicit waits only: an implicit wait makes every missing optional element block
+    browser.implicitly_wait(0)
     
     return browser
 
-def click_show_more_description(browser):
-    """Try to click 'Show more' button for full description"""
+# Readiness conditions for a book page: the description and rating nodes
+POLL_SECONDS = 0.1
+DESCRIPTION_LOCATORS = [(By.CSS_SELECTOR, '[data-testid="description"]'), (By.ID, 'description')]
+RATING_LOCATORS = [(By.CSS_SELECTOR, '.RatingStatistics__rating'), (By.CSS_SELECTOR, '[itemprop="ratingValue"]')]
+TITLE_LOCATORS = [(By.CSS_SELECTOR, 'h1[data-testid="bookTitle"]'), (By.ID, 'bookTitle')]
+
+SHOW_MORE_LOCATORS = [
+    (By.CSS_SELECTOR, '[data-testid="description"] button'),
+    (By.XPATH, '//button[contains(normalize-space(.), "Show more")]'),
+    (By.XPATH, '//a[contains(normalize-space(.), "...more")]'),
+    (By.CSS_SELECTOR, '.Button--inline'),
+    (By.CSS_SELECTOR, '[data-testid="showMore"]'),
+    (By.CSS_SELECTOR, '#description a'),
+    (By.CSS_SELECTOR, 'a[class*="expand"]'),
+]
+
+def any_present(locators):
+    return EC.any_of(*(EC.presence_of_element_located(locator) for locator in locators))
+
+def description_length(browser):
+    for locator in DESCRIPTION_LOCATORS:
+        elements = browser.find_elements(*locator)
+        if elements:
+            return len(elements[0].text)
+    return 0
+
+def wait_for_book_content(browser, timeout=15, rating_timeout=3):
+    """Wait until the description (or at least the title) is in the DOM, then briefly for the rating.
+    Returns False if the page never showed book content."""
     try:
-        show_more_selectors = [
-            'button[data-testid="contentReviewedByUsers"] button',
-            'button:contains("Show more")',
-            'a:contains("...more")',
-            '.Button--inline',
-            '[data-testid="showMore"]',
-            '#description a',
-            'a[class*="expand"]'
-        ]
-        
-        for selector in show_more_selectors:
-            try:
-                elements = browser.find_elements(By.CSS_SELECTOR, selector)
-                for element in elements:
-                    if element.is_displayed() and element.is_enabled():
-                        text = element.text.lower()
-                        if 'more' in text or 'expand' in text:
-                            browser.execute_script("arguments[0].click();", element)
-                            time.sleep(1)
-                            logger.info("✅ Clicked 'Show more' for description")
-                            return True
-            except:
-                continue
+        WebDriverWait(browser, timeout, poll_frequency=POLL_SECONDS).until(any_present(DESCRIPTION_LOCATORS + TITLE_LOCATORS))
+    except TimeoutException:
         return False
-    except:
+    try:
+        WebDriverWait(browser, rating_timeout, poll_frequency=POLL_SECONDS).until(any_present(RATING_LOCATORS))
+    except TimeoutException:
+        pass  # some books have no ratings yet
+    return True
+
+def click_show_more_description(browser, timeout=3):
+    """Try to click 'Show more' button for full description, then wait for the text to expand"""
+    try:
+        for locator in SHOW_MORE_LOCATORS:
+            for element in browser.find_elements(*locator):
+                if element.is_displayed() and element.is_enabled():
+                    text = element.text.lower()
+                    if 'more' in text or 'expand' in text:
+                        before = description_length(browser)
+                        browser.execute_script("arguments[0].click();", element)
+                        try:
+                            WebDriverWait(browser, timeout, poll_frequency=POLL_SECONDS).until(lambda b: description_length(b) > before)
+                        except TimeoutException:
+                            pass
+                        logger.info("✅ Clicked 'Show more' for description")
+                        return True
+        return False
+    except WebDriverException:
         return False
 
 def extract_rating_enhanced(soup, browser):
@@ -192,145 +229,179 @@ def extract_full_description(soup):
     
     return description
 
-def scrape_single_book_complete(browser, url):
-    """Complete book scraping with full descriptions and ratings"""
+def parse_book_page(soup):
+    """Extract title, author, rating, description and genres from a parsed book page"""
+    # Extract Title
+    title = None
+    title_selectors = ['h1[data-testid="bookTitle"]', 'h1#bookTitle', 'h1']
+    for selector in title_selectors:
+        element = soup.select_one(selector)
+        if element:
+            title = element.get_text(strip=True)
+            if title:
+                break
+    
+    # Extract Author
+    author = None
+    author_selectors = ['[data-testid="name"]', '.authorName', 'a.authorName span']
+    for selector in author_selectors:
+        element = soup.select_one(selector)
+        if element:
+            author = element.get_text(strip=True)
+            if author:
+                break
+    
+    # Extract rating and rating count
+    rating, rating_count = extract_rating_enhanced(soup, None)
+    
+    # Extract FULL description
+    description = extract_full_description(soup)
+    
+    # Extract genres
+    genres = []
+    genre_elements = soup.select('[data-testid="genresList"] a') or soup.select('a.bookPageGenreLink')
+    if genre_elements:
+        genres = [g.get_text(strip=True) for g in genre_elements[:5]]
+    
+    if title and author:
+        return {
+            'title': title,
+            'author': author,
+            'rating': rating,
+            'rating_count': rating_count,
+            'description': description,
+            'genres': ', '.join(genres) if genres else None
+        }
+    return None
+
+def log_book_result(result):
+    """Log the rating/description status of a scraped book"""
+    rating = result.get('rating')
+    description = result.get('description')
+    rating_status = f"Rating {rating}" if rating else "NO RATING"
+    desc_length = len(description) if description else 0
+    logger.info(f"✅ {result['title']}: {rating_status} | Desc: {desc_length} chars")
+
+def scrape_single_book_complete(browser, url, limiter=None):
+    """Complete book scraping with full descriptions and ratings.
+    Waits only as long as the page needs; ``limiter`` paces requests across all workers."""
     try:
+        if limiter is not None:
+            limiter.acquire()
         browser.get(url)
-        WebDriverWait(browser, 15).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-        
-        # Wait for content to load
-        time.sleep(random.uniform(3, 5))
+        if not wait_for_book_content(browser):
+            return None
         
         # Try to expand description
         click_show_more_description(browser)
-        time.sleep(2)
-        
-        soup = BeautifulSoup(browser.page_source, 'html.parser')
-        
-        # Extract Title
-        title = None
-        title_selectors = ['h1[data-testid="bookTitle"]', 'h1#bookTitle', 'h1']
-        for selector in title_selectors:
-            element = soup.select_one(selector)
-            if element:
-                title = element.get_text(strip=True)
-                if title:
-                    break
         
-        # Extract Author
-        author = None
-        author_selectors = ['[data-testid="name"]', '.authorName', 'a.authorName span']
-        for selector in author_selectors:
-            element = soup.select_one(selector)
-            if element:
-                author = element.get_text(strip=True)
-                if author:
-                    break
-        
-        # Extract rating and rating count
-        rating, rating_count = extract_rating_enhanced(soup, browser)
-        
-        # Extract FULL description
-        description = extract_full_description(soup)
-        
-        # Extract genres
-        genres = []
-        genre_elements = soup.select('[data-testid="genresList"] a') or soup.select('a.bookPageGenreLink')
-        if genre_elements:
-            genres = [g.get_text(strip=True) for g in genre_elements[:5]]
-        
-        if title and author:
-            result = {
-                'title': title,
-                'author': author,
-                'rating': rating,
-                'rating_count': rating_count,
-                'description': description,
-                'genres': ', '.join(genres) if genres else None
-            }
-            
-            # Log status
-            rating_status = f"Rating {rating}" if rating else "NO RATING"
-            desc_length = len(description) if description else 0
-            logger.info(f"✅ {title}: {rating_status} | Desc: {desc_length} chars")
-            
-            return result
-        return None
+        record = extract_book(browser.page_source)
+        if record is None:
+            return None
+        result = record.as_dict()
+        log_book_result(result)
+        return result
         
     except Exception as e:
         return None
 
-def worker_function_complete(url_chunk, worker_id):
-    """Worker function for complete data extraction"""
-    browser = setup_optimized_driver()
-    worker_data = []
-    
-    try:
-        for i, url in enumerate(url_chunk):
-            try:
-                book_data = scrape_single_book_complete(browser, url)
-                if book_data:
-                    worker_data.append(book_data)
-                
-                time.sleep(random.uniform(2, 4))
-                
-                if (i + 1) % 20 == 0:
-                    ratings_found = sum(1 for book in worker_data if book.get('rating'))
-                    avg_desc_length = sum(len(book.get('description', '')) for book in worker_data) / len(worker_data) if worker_data else 0
-                    logger.info(f"Worker {worker_id}: {i+1}/{len(url_chunk)} - Books: {len(worker_data)} - Ratings: {ratings_found} - Avg Desc: {avg_desc_length:.0f} chars")
-                    
-            except:
-                continue
-    
-    finally:
-        browser.quit()
-    
-    ratings_found = sum(1 for book in worker_data if book.get('rating'))
-    avg_desc_length = sum(len(book.get('description', '')) for book in worker_data) / len(worker_data) if worker_data else 0
-    logger.info(f"Worker {worker_id} COMPLETED: {len(worker_data)} books - {ratings_found} ratings - Avg desc: {avg_desc_length:.0f} chars")
-    return worker_data
+def scrape_book_task(pool, state, limiter, url):
+    """Scrape one URL on a pooled browser and record the outcome in ``state``.
+    None marks the attempt as failed for the work queue."""
+    book_data = pool.run(functools.partial(scrape_single_book_complete, limiter=limiter), url)
+    if state is not None:
+        if book_data:
+            state.mark_done(url, book_data)
+        else:
+            state.mark_failed(url, 'no result')
+    return book_data
 
-def process_batch(batch_urls, batch_num):
-    """Process a single batch of URLs"""
-    logger.info(f"🔄 Processing batch {batch_num} with {len(batch_urls)} books")
+def process_batch(batch_urls, batch_num, pool, num_workers=4, max_attempts=3, state=None, limiter=None):
+    """Process a single batch of URLs; returns the scraped books and the URLs that kept failing"""
+    logger.info(f"🔄 Processing batch {batch_num} with {len(batch_urls)} books on {num_workers} workers")
     
-    num_workers = 4
-    chunk_size = len(batch_urls) // num_workers
-    url_chunks = [batch_urls[i:i + chunk_size] for i in range(0, len(batch_urls), chunk_size)]
+    work = WorkQueue(batch_urls, max_attempts=max_attempts)
+    batch_data = work.run(functools.partial(scrape_book_task, pool, state, limiter), num_workers)
     
-    batch_data = []
+    if work.dead_letters:
+        logger.warning(f"⚠️ Batch {batch_num}: {len(work.dead_letters)} URLs failed after {max_attempts} attempts")
+    return batch_data, work.dead_letters
+
+def process_batch_http(batch_urls, batch_num, engine, state=None):
+    """Fetch a batch over plain HTTP with ``engine`` (a ``fetch_engine.FetchEngine``),
+    which only opens a pooled browser for pages missing rendered fields.
+    Same return value as ``process_batch``; failed URLs stay pending in ``state`` for the next run."""
+    logger.info(f"🔄 Fetching batch {batch_num} with {len(batch_urls)} books over HTTP")
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
-        futures = [executor.submit(worker_function_complete, chunk, i) for i, chunk in enumerate(url_chunks)]
-        
-        for future in concurrent.futures.as_completed(futures):
-            try:
-                worker_data = future.result()
-                batch_data.extend(worker_data)
-            except Exception as e:
-                logger.error(f"❌ Worker failed: {str(e)}")
+    records = asyncio.run(engine.scrape_urls(batch_urls))
+    batch_data, dead_letters = [], []
+    for url, book_data in zip(batch_urls, records):
+        if book_data:
+            batch_data.append(book_data)
+            if state is not None:
+                state.mark_done(url, book_data)
+        else:
+            dead_letters.append({'item': url, 'attempts': engine.retries + 1, 'error': 'no result'})
+            if state is not None:
+                state.mark_failed(url, 'no result')
     
-    return batch_data
+    if dead_letters:
+        logger.warning(f"⚠️ Batch {batch_num}: {len(dead_letters)} URLs could not be scraped")
+    return batch_data, dead_letters
 
 def main():
     """Main function with batch processing"""
+    parser = argparse.ArgumentParser(description="Scrape complete book details from Goodreads book pages")
+    parser.add_argument('--engine', choices=['http', 'browser'], default='http',
+                        help="http: async fetches with a browser only for unrendered pages; browser: Selenium for every page")
+    parser.add_argument('--no-fallback', action='store_true', help="http engine: never start Chrome for incomplete pages")
+    parser.add_argument('--max-per-host', type=int, default=8, help="http engine: requests in flight per host")
+    parser.add_argument('--workers', type=int, default=4, help="concurrent browsers pulling from the work queue")
+    parser.add_argument('--max-attempts', type=int, default=3, help="attempts per URL before it is dead-lettered")
+    parser.add_argument('--rate', type=float, default=1.0, help="page loads (http engine: requests) per second")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--max-batches', type=int, help="stop after this many batches (default: all)")
+    parser.add_argument('--state', default='scrape_state.sqlite', help="URL state store used to resume interrupted runs")
+    parser.add_argument('--output-dir', default='books_parts', help="directory of per-batch Parquet part files")
+    parser.add_argument('--excel', action='store_true', help="also write the final dataset as .xlsx")
+    args = parser.parse_args()
+    
+    # One pool of long-lived browsers for every batch
+    pool = BrowserPool(setup_optimized_driver, size=args.workers)
+    state = ScrapeState(args.state)
+    limiter = TokenBucket(args.rate)
+    engine = None
+    if args.engine == 'http':
+        # Imported here: fetch_engine builds on this module's Selenium helpers
+        from fetch_engine import FetchEngine
+        engine = FetchEngine(max_per_host=args.max_per_host, rate=args.rate,
+                             selenium_fallback=not args.no_fallback, pool=pool)
     try:
-        # Load all URLs
+        # Load all URLs; ones finished by an earlier run are skipped
         df_urls = pd.read_csv('all_book_urls_combined.csv')
-        book_urls = df_urls['book_url'].dropna().tolist()
+        state.add(dict.fromkeys(normalize_book_url(url) for url in df_urls['book_url'].dropna()))
+        book_urls = state.pending(max_attempts=args.max_attempts)
         
-        batch_size = 1000  # Process 1,000 books per batch
+        batch_size = args.batch_size
         total_books = len(book_urls)
-        all_scraped_data = []
+        first_batch = state.get_meta('batches_completed', 0) + 1
+        
+        # Books finished after the last written part belong to an interrupted batch
+        writer = PartWriter(args.output_dir, BOOK_SCHEMA, prefix='batch')
+        unwritten = state.records(since=state.get_meta('written_until', 0))
+        if unwritten:
+            writer.append(unwritten, name=f'batch-{first_batch:05d}-recovered-{int(time.time())}')
+            state.set_meta('written_until', time.time())
+            logger.info(f"♻️ Wrote {len(unwritten)} books from the interrupted batch")
         
-        logger.info(f"📚 Total books available: {total_books}")
+        logger.info(f"📚 Books left to scrape: {total_books} (state: {state.counts()})")
         logger.info(f"🎯 Processing in batches of {batch_size}")
         
         # Process in batches
         for batch_start in range(0, total_books, batch_size):
             batch_end = min(batch_start + batch_size, total_books)
             current_batch = book_urls[batch_start:batch_end]
-            batch_num = (batch_start // batch_size) + 1
+            batch_num = first_batch + batch_start // batch_size
             
             logger.info(f"\n{'='*60}")
             logger.info(f"📦 PROCESSING BATCH {batch_num}")
@@ -338,58 +409,67 @@ def main():
             logger.info(f"{'='*60}")
             
             # Process current batch
-            batch_data = process_batch(current_batch, batch_num)
-            all_scraped_data.extend(batch_data)
+            if engine is not None:
+                batch_data, dead_letters = process_batch_http(current_batch, batch_num, engine, state)
+            else:
+                batch_data, dead_letters = process_batch(current_batch, batch_num, pool, args.workers, args.max_attempts, state, limiter)
+            
+            if dead_letters:
+                pd.DataFrame(dead_letters).rename(columns={'item': 'book_url'}).to_csv(f'books_batch_{batch_num}_failed.csv', index=False)
             
-            # Save batch progress
+            # Save batch progress: one new part file, nothing earlier is rewritten
             if batch_data:
-                df_batch = pd.DataFrame(batch_data)
-                df_batch.to_csv(f'books_batch_{batch_num}_complete.csv', index=False)
+                part = writer.append(batch_data, name=f'batch-{batch_num:05d}')
                 
                 # Calculate statistics
                 ratings_found = sum(1 for book in batch_data if book.get('rating'))
-                avg_desc_length = sum(len(book.get('description', '')) for book in batch_data) / len(batch_data) if batch_data else 0
+                avg_desc_length = sum(len(book.get('description') or '') for book in batch_data) / len(batch_data)
                 
-                logger.info(f"✅ Batch {batch_num} completed:")
+                logger.info(f"✅ Batch {batch_num} completed, saved to {part}:")
                 logger.info(f"   📊 Books scraped: {len(batch_data)}")
                 logger.info(f"   ⭐ Ratings found: {ratings_found} ({ratings_found/len(batch_data)*100:.1f}%)")
                 logger.info(f"   📄 Avg description length: {avg_desc_length:.0f} characters")
             
-            # Save cumulative progress
-            df_progress = pd.DataFrame(all_scraped_data)
-            df_progress.to_csv(f'books_progress_total_{len(all_scraped_data)}.csv', index=False)
+            state.set_meta('written_until', time.time())
+            state.set_meta('batches_completed', batch_num)
+            logger.info(f"📊 Total collected so far: {state.counts().get('done', 0)} books")
             
-            logger.info(f"📊 Total collected so far: {len(all_scraped_data)} books")
-            
-            # Stop after 3 batches for testing (remove this line to process all)
-            if batch_num >= 3:
-                logger.info("🛑 Stopping after 3 batches for testing")
+            if args.max_batches and batch_num - first_batch + 1 >= args.max_batches:
+                logger.info(f"🛑 Stopping after {args.max_batches} batches (--max-batches)")
                 break
         
-        # Save final results
-        if all_scraped_data:
-            df_final = pd.DataFrame(all_scraped_data)
-            df_final.to_csv('books_complete_final_dataset.csv', index=False)
-            df_final.to_excel('books_complete_final_dataset.xlsx', index=False)
+        # Save final results by concatenating the parts
+        total_scraped = writer.finalize('books_complete_final_dataset.parquet', 'books_complete_final_dataset.csv')
+        if total_scraped:
+            df_final = pd.read_parquet('books_complete_final_dataset.parquet', columns=['rating', 'description'])
+            if args.excel:
+                pd.read_parquet('books_complete_final_dataset.parquet').to_excel('books_complete_final_dataset.xlsx', index=False)
             
             # Final statistics
-            total_ratings = sum(1 for book in all_scraped_data if book.get('rating'))
-            avg_desc_length = sum(len(book.get('description', '')) for book in all_scraped_data) / len(all_scraped_data) if all_scraped_data else 0
+            total_ratings = int(df_final['rating'].notna().sum())
+            avg_desc_length = df_final['description'].fillna('').str.len().mean()
             
             logger.info(f"\n🎉 ALL BATCHES COMPLETED!")
-            logger.info(f"📊 Total books scraped: {len(all_scraped_data)}")
-            logger.info(f"⭐ Total ratings found: {total_ratings} ({total_ratings/len(all_scraped_data)*100:.1f}%)")
+            logger.info(f"📊 Total books scraped: {total_scraped}")
+            logger.info(f"⭐ Total ratings found: {total_ratings} ({total_ratings/total_scraped*100:.1f}%)")
             logger.info(f"📄 Average description length: {avg_desc_length:.0f} characters")
             
             print(f"\n📖 FINAL RESULTS:")
-            print(f"Total books: {len(all_scraped_data)}")
-            print(f"Success rate (ratings): {total_ratings/len(all_scraped_data)*100:.1f}%")
+            print(f"Total books: {total_scraped}")
+            print(f"Success rate (ratings): {total_ratings/total_scraped*100:.1f}%")
             print(f"Average description length: {avg_desc_length:.0f} characters")
         
     except Exception as e:
         logger.error(f"❌ Error: {str(e)}")
         import traceback
         logger.error(f"📋 Traceback: {traceback.format_exc()}")
+    
+    finally:
+        if engine is not None:
+            logger.info(f"📊 Fetch stats: {engine.stats}")
+        logger.info(f"🔒 Closing browser pool: {pool.stats}")
+        pool.close()
+        state.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,72 @@
+import time
+
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+
+from recommender import similar_rows, top_n
+
+
+def lsa_embeddings(tfidf_matrix, n_components=256, random_state=0):
+    """Reduce a TF-IDF matrix with TruncatedSVD (LSA) to L2-normalized float32 rows.
+
+    Returns the fitted ``TruncatedSVD`` (its ``components_`` embed new documents later)
+    and the dense (n_books x n_components) embedding, where cosine similarity is a
+    plain dot product.
+    """
+    svd = TruncatedSVD(n_components=n_components, random_state=random_state)
+    embeddings = svd.fit_transform(tfidf_matrix)
+    return svd, normalize(embeddings).astype(np.float32)
+
+
+def embed(components, tfidf_rows):
+    """Project new TF-IDF rows into an existing LSA space given ``svd.components_``"""
+    return normalize(np.asarray(tfidf_rows @ np.asarray(components).T)).astype(np.float32)
+
+
+def similar_embedding_rows(embeddings, rows, n=5):
+    """Dense counterpart of ``recommender.similar_rows``: one BLAS product per batch"""
+    rows = np.asarray(rows).reshape(-1)
+    return top_n(embeddings[rows] @ embeddings.T, n, exclude=rows)
+
+
+def _latency_ms(func, rows):
+    latencies = []
+    for row in rows:
+        start = time.perf_counter()
+        func([row])
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1000
+
+
+def compare_with_sparse(tfidf_matrix, embeddings, query_rows, k=10):
+    """Storage, latency and neighbor overlap of the dense LSA path vs the sparse TF-IDF path.
+
+    Quality is measured as overlap@k: the share of each query's sparse top-k
+    neighbors that the dense path also returns.
+    """
+    query_rows = np.asarray(query_rows)
+    sparse_ids, _ = similar_rows(tfidf_matrix, query_rows, k)
+    dense_ids, _ = similar_embedding_rows(embeddings, query_rows, k)
+    overlap = np.mean([len(set(s) & set(d)) / k for s, d in zip(sparse_ids.tolist(), dense_ids.tolist())])
+
+    sparse_ms = _latency_ms(lambda rows: similar_rows(tfidf_matrix, rows, k), query_rows)
+    dense_ms = _latency_ms(lambda rows: similar_embedding_rows(embeddings, rows, k), query_rows)
+
+    start = time.perf_counter()
+    similar_rows(tfidf_matrix, query_rows, k)
+    sparse_batch_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    similar_embedding_rows(embeddings, query_rows, k)
+    dense_batch_ms = (time.perf_counter() - start) * 1000
+
+    sparse_bytes = tfidf_matrix.data.nbytes + tfidf_matrix.indices.nbytes + tfidf_matrix.indptr.nbytes
+    return {
+        'sparse_mb': sparse_bytes / 2**20,
+        'dense_mb': embeddings.nbytes / 2**20,
+        'sparse_p50_ms': float(np.percentile(sparse_ms, 50)),
+        'dense_p50_ms': float(np.percentile(dense_ms, 50)),
+        'sparse_batch_ms': sparse_batch_ms,
+        'dense_batch_ms': dense_batch_ms,
+        f'overlap@{k}': float(overlap),
+    }
@@ -0,0 +1,162 @@
+"""Async HTTP fetch engine for book pages.
+
+Book pages carry title, author, rating meta, description and genres in the server
+HTML, so most of them don't need a browser. Pages are fetched concurrently with
+aiohttp (at most ``max_per_host`` requests in flight per host, and a token bucket
+per host for the request rate) and handed to the same extractor ``data_scraper.py``
+uses (``book_extractor.extract_book``). A page is re-scraped with Selenium only when
+it was fetched but the plain HTML is missing fields that need rendering; a 404 or a
+page that never loaded is a failure, not a reason to start Chrome. ``data_scraper.py``
+runs its batches through this engine by default; on its own:
+
+    python fetch_engine.py --input all_book_urls_combined.csv --output books_async_complete.csv
+"""
+import argparse
+import asyncio
+import functools
+import logging
+import random
+from urllib.parse import urlsplit
+
+import aiohttp
+import pandas as pd
+
+from book_extractor import extract_book
+from browser_pool import BrowserPool
+from data_scraper import log_book_result, scrape_single_book_complete, setup_optimized_driver
+from rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def needs_rendering(record):
+    """True when fetched HTML lacked fields only a rendered page provides (None: nothing parsed)"""
+    return record is None or not record.get('description')
+
+
+class FetchEngine:
+    """Fetches and parses book pages concurrently, falling back to Selenium per page"""
+
+    def __init__(self, max_per_host=8, rate=2.0, burst=4, timeout=20, retries=2, backoff=1.0,
+                 selenium_fallback=True, headers=None, pool=None):
+        self.max_per_host = max_per_host
+        self.rate = rate
+        self.burst = burst
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.selenium_fallback = selenium_fallback
+        self.headers = headers or HEADERS
+        self.stats = {'fetched': 0, 'parsed': 0, 'fallbacks': 0, 'failed': 0}
+        self._semaphores = {}
+        self._buckets = {}
+        # A caller's pool (data_scraper's) is shared and left open by close()
+        self._owns_pool = pool is None
+        self._pool = pool or BrowserPool(setup_optimized_driver, size=1)
+
+    def _host_limits(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return self._semaphores[host], self._buckets[host]
+
+    async def fetch(self, session, url):
+        """Page HTML, or None after ``retries`` failed attempts"""
+        semaphore, bucket = self._host_limits(url)
+        for attempt in range(self.retries + 1):
+            async with semaphore:
+                await bucket.acquire_async()
+                try:
+                    async with session.get(url) as response:
+                        if response.status == 200:
+                            self.stats['fetched'] += 1
+                            return await response.text()
+                        if response.status not in RETRY_STATUSES:
+                            logger.warning(f"⚠️ {url}: HTTP {response.status}")
+                            return None
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logger.warning(f"⚠️ {url}: {type(e).__name__} (attempt {attempt + 1})")
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff * (2 ** attempt + random.random()))
+        return None
+
+    def _scrape_with_browser(self, url, bucket):
+        return self._pool.run(functools.partial(scrape_single_book_complete, limiter=bucket), url)
+
+    async def scrape_book(self, session, url):
+        html = await self.fetch(session, url)
+        if html is None:
+            self.stats['failed'] += 1
+            return None
+        record = extract_book(html)
+        record = record.as_dict() if record else None
+        if needs_rendering(record) and self.selenium_fallback:
+            self.stats['fallbacks'] += 1
+            _, bucket = self._host_limits(url)
+            rendered = await asyncio.get_running_loop().run_in_executor(None, self._scrape_with_browser, url, bucket)
+            record = rendered or record
+        elif record:
+            log_book_result(record)
+        if record:
+            self.stats['parsed'] += 1
+        else:
+            self.stats['failed'] += 1
+        return record
+
+    async def scrape_urls(self, urls):
+        """One record (or None if it could not be scraped) per URL, in input order"""
+        # Semaphores belong to the event loop they were first used on, and each call
+        # may run under its own asyncio.run(); the rate buckets carry over
+        self._semaphores = {}
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(headers=self.headers, timeout=timeout) as session:
+            return await asyncio.gather(*(self.scrape_book(session, url) for url in urls))
+
+    async def scrape_all(self, urls):
+        """Records for every URL that could be scraped, in input order"""
+        return [record for record in await self.scrape_urls(urls) if record]
+
+    def close(self):
+        if self._owns_pool:
+            self._pool.close()
+
+
+def scrape_books(urls, **engine_options):
+    """Blocking wrapper: scrape ``urls`` with a fresh engine and return the records"""
+    engine = FetchEngine(**engine_options)
+    try:
+        records = asyncio.run(engine.scrape_all(urls))
+    finally:
+        engine.close()
+    logger.info(f"📊 Fetch stats: {engine.stats}")
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape book pages over plain HTTP with a Selenium fallback")
+    parser.add_argument('--input', default='all_book_urls_combined.csv')
+    parser.add_argument('--output', default='books_async_complete.csv')
+    parser.add_argument('--max-per-host', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=2.0, help="requests per second per host")
+    parser.add_argument('--burst', type=int, default=4)
+    parser.add_argument('--no-fallback', action='store_true', help="never start Chrome for incomplete pages")
+    args = parser.parse_args()
+
+    book_urls = pd.read_csv(args.input)['book_url'].dropna().tolist()
+    logger.info(f"📚 Fetching {len(book_urls)} books")
+    records = scrape_books(book_urls, max_per_host=args.max_per_host, rate=args.rate, burst=args.burst,
+                           selenium_fallback=not args.no_fallback)
+    pd.DataFrame(records).to_csv(args.output, index=False)
+    logger.info(f"💾 Saved {len(records)} books to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Incremental model updates for newly scraped book batches.
+
+New books are appended to the catalogue and transformed against the *existing*
+vocabulary and idf weights; nothing already in the artifact is re-vectorized. Only
+the neighbor lists that the new books can change are recomputed: the new books get
+a full top-K search, and an existing book is touched only if some new book scores
+above its current K-th neighbor. Books the catalogue already has (same title and
+author) are skipped rather than appended a second time.
+
+Cost policy: the neighbor search and the title indexes scale with the batch (one
+sparse pass over the old matrix for the old x new scores; new titles are merged
+into the saved index arrays). Writing the version does not: artifact versions are
+immutable, so each update writes a full copy of the row-indexed arrays and the
+titles/authors JSON, roughly O(catalogue) disk and a few hundred milliseconds at
+50k books. Only the vocabulary, idf and SVD files are hard-linked from the parent.
+Ingest whole scraped parts rather than a handful of books at a time; old versions
+are pruned after each update so disk use stays at ``keep_versions`` copies.
+
+Drift policy: a frozen vocabulary slowly goes stale. Words that appear only in new
+books are dropped by ``transform`` and idf weights no longer reflect the corpus.
+Every update records the batch's out-of-vocabulary token rate and the number of rows
+appended since the last full fit. Once either passes its threshold
+(``max_oov_rate`` for a single batch, ``max_growth`` as a fraction of the books the
+vocabulary was fitted on) the new manifest is marked ``needs_refit`` and the next
+scheduled build should re-run the full notebook pipeline.
+"""
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from catalogue_index import normalize_title
+from embeddings import embed
+from model_artifact import prune_versions, save_model_artifact
+from preprocessing import CachedStemmer, build_tags, clean_author, stem_texts
+from recommender import top_n
+
+logger = logging.getLogger(__name__)
+
+
+def scraped_batch_tags(batch_df, stemmer):
+    """Build stemmed Tags for a batch of books from data_scraper.py (e.g. one ``books_parts`` part file)"""
+    author_alone = [clean_author(author) for author in batch_df["author"]]
+    descriptions = batch_df["description"].fillna("NA")
+    genres = [genre.split(", ") if isinstance(genre, str) else [] for genre in batch_df["genres"]]
+    tags = [build_tags(*fields) for fields in zip(author_alone, descriptions, genres)]
+    return stem_texts(tags, stemmer), author_alone
+
+
+def oov_rate(vectorizer, texts):
+    """Share of unigram tokens in ``texts`` that the fitted vocabulary doesn't know"""
+    analyzer = vectorizer.build_analyzer()
+    vocabulary = vectorizer.vocabulary_
+    total = unknown = 0
+    for text in texts:
+        for token in analyzer(text):
+            if " " in token:
+                continue
+            total += 1
+            unknown += token not in vocabulary
+    return unknown / total if total else 0.0
+
+
+def new_books(model, batch_df, authors=None):
+    """The rows of ``batch_df`` not already in the catalogue or repeated within the batch.
+
+    A book matches on normalized title and primary author (title alone when the
+    artifact has no authors). Re-scraped books would otherwise be appended again and
+    show up as near-1.0 neighbors of their own originals.
+    """
+    seen = set()
+    keep = []
+    for title, author in zip(batch_df["title"], batch_df["author"]):
+        author = clean_author(author)
+        key = (normalize_title(title), author if authors is not None else None)
+        if title in model.catalogue and (
+            authors is None or any(authors[row] == author for row in model.catalogue.lookup(title))
+        ):
+            keep.append(False)
+        else:
+            keep.append(key not in seen)
+        seen.add(key)
+    return batch_df[np.array(keep, dtype=bool)]
+
+
+def update_neighbors(old_matrix, neighbor_ids, neighbor_scores, new_matrix, chunk_size=1024):
+    """Merge a batch of new rows into existing top-K neighbor tables.
+
+    ``old_matrix`` rows must already be L2-normalized, as TF-IDF rows are; it is read
+    once for the old x new scores, and everything else is proportional to the batch.
+    Returns new (ids, scores) tables covering old + new rows and the ids of the old
+    rows whose lists changed.
+    """
+    old_matrix = sparse.csr_matrix(old_matrix)
+    new_matrix = normalize(sparse.csr_matrix(new_matrix, dtype=np.float32), norm='l2')
+    n_old, k = neighbor_ids.shape
+    n_new = new_matrix.shape[0]
+
+    cross = (old_matrix @ new_matrix.T).tocsr()
+
+    # New books: scores against the old catalogue are cross.T, against each other new @ new.T
+    cross_t = cross.T.tocsr()
+    new_self = (new_matrix @ new_matrix.T).tocsr()
+    new_ids = np.empty((n_new, k), dtype=np.int32)
+    new_scores = np.empty((n_new, k), dtype=np.float32)
+    for start in range(0, n_new, chunk_size):
+        chunk = np.arange(start, min(start + chunk_size, n_new))
+        block = np.hstack([cross_t[chunk].toarray(), new_self[chunk].toarray()])
+        top, top_scores = top_n(block, k, exclude=n_old + chunk)
+        new_ids[chunk] = top
+        new_scores[chunk] = top_scores
+
+    # Old books: only those where some new book beats the current K-th score
+    kth_score = np.asarray(neighbor_scores[:, -1]) if k else np.full(n_old, np.inf)
+    rows = np.repeat(np.arange(n_old), np.diff(cross.indptr))
+    affected = np.unique(rows[cross.data > kth_score[rows]])
+
+    ids = np.vstack([np.asarray(neighbor_ids), new_ids]).astype(np.int32)
+    scores = np.vstack([np.asarray(neighbor_scores), new_scores]).astype(np.float32)
+    if len(affected) and k:
+        candidate_ids = np.hstack([ids[affected], np.broadcast_to(np.arange(n_old, n_old + n_new), (len(affected), n_new))])
+        candidate_scores = np.hstack([scores[affected], cross[affected].toarray()])
+        best, best_scores = top_n(candidate_scores, k)
+        ids[affected] = np.take_along_axis(candidate_ids, best, axis=1)
+        scores[affected] = best_scores
+
+    return ids, scores, affected
+
+
+def update_model(model, batch_df, root, max_oov_rate=0.3, max_growth=0.2, version=None, keep_versions=3):
+    """Append a scraped batch to ``model`` and write the result as a new artifact version.
+
+    Returns a small report (version, rows added, affected books, drift numbers and
+    whether a full refit is now due). All but the ``keep_versions`` newest versions
+    under ``root`` are deleted afterwards; pass None to keep everything.
+    """
+    stem_cache_path = os.path.join(model.path, 'stem_cache.json')
+    stemmer = CachedStemmer.load(stem_cache_path) if os.path.exists(stem_cache_path) else CachedStemmer()
+
+    authors = model.authors
+    n_scraped = len(batch_df)
+    batch_df = new_books(model, batch_df, authors)
+    if n_scraped > len(batch_df):
+        logger.info(f"⏭️ Skipping {n_scraped - len(batch_df)} books already in the catalogue")
+    if batch_df.empty:
+        return {
+            'version': model.version,
+            'rows_added': 0,
+            'rows_skipped': n_scraped,
+            'affected_books': 0,
+            'oov_rate': 0.0,
+            'rows_since_fit': model.manifest.get('rows_since_fit', 0),
+            'needs_refit': model.manifest.get('needs_refit', False),
+        }
+
+    tags, author_alone = scraped_batch_tags(batch_df, stemmer)
+    vectorizer = model.vectorizer
+    new_matrix = vectorizer.transform(tags)
+    batch_oov_rate = oov_rate(vectorizer, tags)
+
+    neighbor_ids, neighbor_scores, affected = update_neighbors(
+        model.tfidf_matrix, model.neighbor_ids, model.neighbor_scores, new_matrix
+    )
+
+    fit_n_books = model.manifest.get('fit_n_books', model.manifest['n_books'])
+    rows_since_fit = model.manifest.get('rows_since_fit', 0) + len(batch_df)
+    needs_refit = (
+        model.manifest.get('needs_refit', False)
+        or batch_oov_rate > max_oov_rate
+        or rows_since_fit > max_growth * fit_n_books
+    )
+    if needs_refit:
+        logger.warning(f"⚠️ Vocabulary drift: OOV rate {batch_oov_rate:.1%}, {rows_since_fit} rows since last fit - full refit due")
+
+    authors = authors or [None] * len(model.titles)
+    embeddings = ann_index = None
+    if model.embeddings is not None:
+        embeddings = np.vstack([model.embeddings, embed(model.svd_components, new_matrix)])
+        if model.manifest.get('ann'):
+            ann_index = model.dense_index('ivf').extended(embeddings)
+    new_titles = [str(title) for title in batch_df["title"]]
+    new_version = save_model_artifact(
+        root, vectorizer,
+        sparse.vstack([model.tfidf_matrix, new_matrix], format='csr'),
+        list(model.titles) + new_titles,
+        neighbor_ids, neighbor_scores,
+        rating=np.concatenate([model.rating, pd.to_numeric(batch_df["rating"], errors='coerce').to_numpy()]),
+        bbe_score=np.concatenate([model.bbe_score, np.full(len(batch_df), np.nan)]),
+        authors=authors + author_alone,
+        stemmer=stemmer,
+        embeddings=embeddings,
+        svd_components=model.svd_components,
+        version=version,
+        manifest_extra={
+            'parent_version': model.version,
+            'fit_n_books': fit_n_books,
+            'rows_since_fit': rows_since_fit,
+            'last_oov_rate': batch_oov_rate,
+            'needs_refit': needs_refit,
+        },
+        catalogue=model.catalogue.extended(new_titles),
+        title_search=model.title_search.extended(new_titles, author_alone),
+        parent_path=model.path,
+        ann_index=ann_index,
+    )
+    if keep_versions is not None:
+        removed = prune_versions(root, keep_versions)
+        if removed:
+            logger.info(f"🧹 Pruned old artifact versions: {', '.join(removed)}")
+    logger.info(f"✅ Added {len(batch_df)} books as version {new_version}, updated {len(affected)} neighbor lists")
+    return {
+        'version': new_version,
+        'rows_added': len(batch_df),
+        'rows_skipped': n_scraped - len(batch_df),
+        'affected_books': len(affected),
+        'oov_rate': batch_oov_rate,
+        'rows_since_fit': rows_since_fit,
+        'needs_refit': needs_refit,
+    }
@@ -0,0 +1,23 @@
+"""Single-pass extraction of Goodreads book links from raw page HTML.
+
+One compiled regex scans ``page_source`` for anchor hrefs containing ``/book/show/``.
+Each match is resolved against the page URL, stripped of its query and fragment,
+and de-duplicated in page order. This replaces a ``find_elements`` call per selector
+plus a ``get_attribute('href')`` WebDriver round trip per element.
+"""
+import re
+from urllib.parse import urljoin
+
+SITE_URL = 'https://www.goodreads.com'
+
+BOOK_HREF = re.compile(r'''<a\b[^>]*?\shref\s*=\s*["']([^"'#?]*/book/show/[^"'#?]*)''', re.IGNORECASE)
+
+
+def normalize_book_url(url, base_url=SITE_URL):
+    """Absolute book URL without query string or fragment"""
+    return urljoin(base_url, url.strip()).split('?')[0].split('#')[0]
+
+
+def extract_book_links(html, base_url=SITE_URL):
+    """Normalized /book/show/ URLs of every anchor in ``html``, first occurrence order"""
+    return list(dict.fromkeys(normalize_book_url(href, base_url) for href in BOOK_HREF.findall(html)))
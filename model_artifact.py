@@ -0,0 +1,294 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from ann_index import ExactIndex, IVFIndex
+from catalogue_index import CatalogueIndex
+from recommender import similar_rows
+from title_search import TitleSearchIndex
+
+FORMAT_VERSION = 1
+CURRENT_FILE = 'CURRENT'
+
+# Neighbor search backends for RecommenderModel.similar: sparse TF-IDF cosine, or the
+# LSA embeddings searched exactly or through the saved IVF index
+SEARCH_BACKENDS = ('tfidf', 'exact', 'ivf')
+
+# Vectorizer settings we can round-trip through JSON; everything else keeps its default
+VECTORIZER_PARAMS = [
+    'analyzer', 'binary', 'lowercase', 'max_df', 'max_features', 'min_df', 'ngram_range',
+    'norm', 'smooth_idf', 'stop_words', 'strip_accents', 'sublinear_tf', 'token_pattern', 'use_idf'
+]
+
+
+class RecommenderModel:
+    """Recommender state loaded from an artifact directory.
+
+    All numeric arrays are memory-mapped read-only, so loading is nearly free and every
+    worker process on the host shares the same page cache instead of holding a copy.
+    That includes the title indexes, which the artifact stores as flat arrays; they
+    are only rebuilt on first use for artifacts written without them. The fitted
+    vectorizer is only built on first use.
+    """
+
+    def __init__(self, path, manifest, tfidf_matrix, titles, neighbor_ids, neighbor_scores, rating, bbe_score,
+                 embeddings=None, svd_components=None):
+        self.path = path
+        self.manifest = manifest
+        self.version = manifest['version']
+        self.tfidf_matrix = tfidf_matrix
+        self.titles = titles
+        self.neighbor_ids = neighbor_ids
+        self.neighbor_scores = neighbor_scores
+        self.rating = rating
+        self.bbe_score = bbe_score
+        # Optional LSA mode: dense float32 book embeddings and the SVD projection
+        self.embeddings = embeddings
+        self.svd_components = svd_components
+        self._catalogue = None
+        self._vectorizer = None
+        self._title_search = None
+        self._dense_indexes = {}
+
+    @property
+    def authors(self):
+        """Per-book author_alone, or None when the artifact was saved without authors"""
+        authors_path = os.path.join(self.path, 'authors.json')
+        if not os.path.exists(authors_path):
+            return None
+        with open(authors_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    @property
+    def catalogue(self):
+        if self._catalogue is None:
+            if os.path.exists(os.path.join(self.path, 'catalogue_keys.npy')):
+                self._catalogue = CatalogueIndex.load(self.path, self.titles)
+            else:
+                self._catalogue = CatalogueIndex(self.titles, self.bbe_score)
+        return self._catalogue
+
+    @property
+    def title_search(self):
+        if self._title_search is None:
+            if os.path.exists(os.path.join(self.path, 'trigram_grams.npy')):
+                self._title_search = TitleSearchIndex.load(self.path)
+            else:
+                self._title_search = TitleSearchIndex(self.titles, self.authors)
+        return self._title_search
+
+    def build_indexes(self):
+        """Build the lazy title indexes up front, e.g. before a server takes traffic"""
+        return self.catalogue, self.title_search
+
+    def find_book(self, query):
+        """Row id for an exact, normalized or fuzzy title query"""
+        if query in self.catalogue:
+            return self.catalogue.row(query)
+        return self.title_search.resolve(query)
+
+    def dense_index(self, backend):
+        """The ``exact`` or ``ivf`` index over the LSA embeddings, loaded on first use"""
+        if backend not in self._dense_indexes:
+            if self.embeddings is None:
+                raise ValueError(f"Artifact {self.version} has no embeddings for the {backend!r} backend")
+            if backend == 'exact':
+                self._dense_indexes[backend] = ExactIndex(self.embeddings)
+            elif backend == 'ivf' and self.manifest.get('ann'):
+                self._dense_indexes[backend] = IVFIndex.load(self.path, self.embeddings, self.manifest['ann']['n_probe'])
+            else:
+                raise ValueError(f"Artifact {self.version} has no saved {backend!r} index")
+        return self._dense_indexes[backend]
+
+    def similar(self, rows, n=5, backend='tfidf'):
+        """(ids, scores) of the n nearest books per query row through one of ``SEARCH_BACKENDS``"""
+        if backend == 'tfidf':
+            return similar_rows(self.tfidf_matrix, rows, n)
+        if backend not in SEARCH_BACKENDS:
+            raise ValueError(f"Unknown search backend {backend!r}; expected one of {SEARCH_BACKENDS}")
+        rows = np.asarray(rows).reshape(-1)
+        return self.dense_index(backend).search(self.embeddings[rows], n, exclude=rows)
+
+    @property
+    def vectorizer(self):
+        if self._vectorizer is None:
+            params = dict(self.manifest['vectorizer_params'])
+            params['ngram_range'] = tuple(params['ngram_range'])
+            vectorizer = TfidfVectorizer(**params)
+            with open(os.path.join(self.path, 'vocabulary.json'), encoding='utf-8') as f:
+                vectorizer.vocabulary_ = json.load(f)
+            vectorizer.idf_ = np.load(os.path.join(self.path, 'idf.npy'))
+            self._vectorizer = vectorizer
+        return self._vectorizer
+
+
+def _save_array(path, name, array, dtype):
+    np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(array, dtype=dtype))
+
+
+def save_model_artifact(root, vectorizer, tfidf_matrix, titles, neighbor_ids, neighbor_scores,
+                        rating=None, bbe_score=None, authors=None, stemmer=None, embeddings=None,
+                        svd_components=None, version=None, manifest_extra=None, catalogue=None,
+                        title_search=None, parent_path=None, ann_index=None):
+    """Write a new versioned artifact directory under ``root`` and point CURRENT at it.
+
+    The directory is assembled under a temporary name and renamed into place, so a
+    reader never sees a half-written version. The title lookup and trigram search
+    indexes are saved as ``.npy`` arrays next to the model. A ``stemmer`` with a warm
+    token cache (preprocessing.CachedStemmer) is saved alongside as
+    ``stem_cache.json``. LSA ``embeddings`` and ``svd_components`` are stored as
+    float32 when given, along with the centroids and bucket layout of an
+    ``ann_index`` (ann_index.IVFIndex) built over them, and ``manifest_extra`` is
+    merged into the manifest. Returns the version string.
+
+    Incremental updates pass prebuilt (extended) ``catalogue`` / ``title_search``
+    indexes, and ``parent_path`` so the files a batch can't change (vocabulary, idf,
+    SVD components) are hard-linked from the parent version instead of rewritten.
+    """
+    version = version or time.strftime('%Y%m%d-%H%M%S')
+    path = os.path.join(root, version)
+    tmp_path = os.path.join(root, f'.{version}.tmp')
+    if os.path.exists(path):
+        raise FileExistsError(f"Artifact version {version} already exists in {root}")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    # sorted_indices() copies, so the caller's matrix is never reordered in place
+    tfidf_matrix = sparse.csr_matrix(tfidf_matrix, dtype=np.float32).sorted_indices()
+    _save_array(tmp_path, 'tfidf_data', tfidf_matrix.data, np.float32)
+    # indices and indptr must share a dtype or scipy copies them on load
+    index_dtype = np.int32 if tfidf_matrix.nnz < np.iinfo(np.int32).max else np.int64
+    _save_array(tmp_path, 'tfidf_indices', tfidf_matrix.indices, index_dtype)
+    _save_array(tmp_path, 'tfidf_indptr', tfidf_matrix.indptr, index_dtype)
+    _save_array(tmp_path, 'neighbor_ids', neighbor_ids, np.int32)
+    _save_array(tmp_path, 'neighbor_scores', neighbor_scores, np.float32)
+    if not _link_from_parent(parent_path, tmp_path, 'idf.npy'):
+        _save_array(tmp_path, 'idf', vectorizer.idf_, np.float64)
+
+    if embeddings is not None:
+        _save_array(tmp_path, 'embeddings', embeddings, np.float32)
+        if not _link_from_parent(parent_path, tmp_path, 'svd_components.npy'):
+            _save_array(tmp_path, 'svd_components', svd_components, np.float32)
+        if ann_index is not None:
+            ann_index.save(tmp_path)
+
+    n_books = tfidf_matrix.shape[0]
+    _save_array(tmp_path, 'rating', np.full(n_books, np.nan) if rating is None else rating, np.float32)
+    _save_array(tmp_path, 'bbe_score', np.full(n_books, np.nan) if bbe_score is None else bbe_score, np.float32)
+
+    if not _link_from_parent(parent_path, tmp_path, 'vocabulary.json'):
+        with open(os.path.join(tmp_path, 'vocabulary.json'), 'w', encoding='utf-8') as f:
+            json.dump({term: int(col) for term, col in vectorizer.vocabulary_.items()}, f, ensure_ascii=False)
+    with open(os.path.join(tmp_path, 'titles.json'), 'w', encoding='utf-8') as f:
+        json.dump([str(title) for title in titles], f, ensure_ascii=False)
+    if authors is not None:
+        with open(os.path.join(tmp_path, 'authors.json'), 'w', encoding='utf-8') as f:
+            json.dump([author if isinstance(author, str) else None for author in authors], f, ensure_ascii=False)
+    if stemmer is not None:
+        stemmer.save(os.path.join(tmp_path, 'stem_cache.json'))
+    # Title indexes are built here once so loading processes can memory-map them
+    (catalogue or CatalogueIndex(titles, bbe_score)).save(tmp_path)
+    (title_search or TitleSearchIndex(titles, authors)).save(tmp_path)
+
+    params = vectorizer.get_params()
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'version': version,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'n_books': n_books,
+        'n_features': tfidf_matrix.shape[1],
+        'nnz': int(tfidf_matrix.nnz),
+        'k': int(np.shape(neighbor_ids)[1]),
+        'embedding_dim': None if embeddings is None else int(np.shape(embeddings)[1]),
+        'ann': None if embeddings is None or ann_index is None else {
+            'backend': 'ivf', 'n_lists': len(ann_index.centroids), 'n_probe': ann_index.n_probe,
+        },
+        'vectorizer_params': {name: params[name] for name in VECTORIZER_PARAMS},
+        # Bookkeeping for incremental updates: how many books the vocabulary was fitted on
+        'fit_n_books': n_books,
+        'rows_since_fit': 0,
+    }
+    manifest.update(manifest_extra or {})
+    with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    os.replace(tmp_path, path)
+    _write_current(root, version)
+    return version
+
+
+def _link_from_parent(parent_path, path, name):
+    """Hard-link (or copy, across filesystems) an unchanged file from the parent version"""
+    if parent_path is None or not os.path.exists(os.path.join(parent_path, name)):
+        return False
+    try:
+        os.link(os.path.join(parent_path, name), os.path.join(path, name))
+    except OSError:
+        shutil.copy2(os.path.join(parent_path, name), os.path.join(path, name))
+    return True
+
+
+def prune_versions(root, keep=3):
+    """Delete all but the ``keep`` newest artifact versions; CURRENT is always kept.
+
+    Returns the removed version names.
+    """
+    current = current_version(root)
+    versions = []
+    for name in os.listdir(root):
+        manifest_path = os.path.join(root, name, 'manifest.json')
+        if not name.startswith('.') and os.path.exists(manifest_path):
+            with open(manifest_path, encoding='utf-8') as f:
+                versions.append((json.load(f).get('created_at', ''), name))
+    versions.sort(reverse=True)
+    removed = [name for _, name in versions[keep:] if name != current]
+    for name in removed:
+        shutil.rmtree(os.path.join(root, name))
+    return removed
+
+
+def _write_current(root, version):
+    tmp_file = os.path.join(root, f'.{CURRENT_FILE}.tmp')
+    with open(tmp_file, 'w') as f:
+        f.write(version)
+    os.replace(tmp_file, os.path.join(root, CURRENT_FILE))
+
+
+def current_version(root):
+    """Return the version CURRENT points at"""
+    with open(os.path.join(root, CURRENT_FILE)) as f:
+        return f.read().strip()
+
+
+def load_model_artifact(root, version=None):
+    """Memory-map an artifact version (CURRENT by default) into a RecommenderModel"""
+    version = version or current_version(root)
+    path = os.path.join(root, version)
+    with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest['format_version'] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format {manifest['format_version']} in {path}")
+
+    def load(name):
+        return np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+
+    tfidf_matrix = sparse.csr_matrix(
+        (load('tfidf_data'), load('tfidf_indices'), load('tfidf_indptr')),
+        shape=(manifest['n_books'], manifest['n_features']),
+        copy=False,
+    )
+    with open(os.path.join(path, 'titles.json'), encoding='utf-8') as f:
+        titles = json.load(f)
+
+    has_embeddings = manifest.get('embedding_dim') is not None
+    return RecommenderModel(
+        path, manifest, tfidf_matrix, titles,
+        load('neighbor_ids'), load('neighbor_scores'), load('rating'), load('bbe_score'),
+        embeddings=load('embeddings') if has_embeddings else None,
+        svd_components=load('svd_components') if has_embeddings else None,
+    )
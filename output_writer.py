@@ -0,0 +1,83 @@
+"""Append-only Parquet output for the scrapers.
+
+Every checkpoint writes only its new rows, as one Parquet part file in a directory;
+nothing already on disk is read or rewritten. ``finalize`` builds the combined
+dataset by streaming the parts, one at a time, into a single Parquet and/or CSV
+file. Parts are written to a temporary name and renamed, so a crash never leaves a
+half-written part behind.
+"""
+import os
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+BOOK_SCHEMA = pa.schema([
+    ('title', pa.string()),
+    ('author', pa.string()),
+    ('rating', pa.float64()),
+    ('rating_count', pa.int64()),
+    ('description', pa.string()),
+    ('genres', pa.string()),
+])
+
+URL_SCHEMA = pa.schema([
+    ('book_url', pa.string()),
+    ('genre', pa.string()),
+])
+
+
+class PartWriter:
+    """Writes lists of record dicts as Parquet part files under ``directory``"""
+
+    def __init__(self, directory, schema, prefix='part'):
+        self.directory = directory
+        self.schema = schema
+        self.prefix = prefix
+        os.makedirs(directory, exist_ok=True)
+
+    def parts(self):
+        return sorted(
+            os.path.join(self.directory, name) for name in os.listdir(self.directory)
+            if name.endswith('.parquet')
+        )
+
+    def append(self, records, name=None):
+        """Write ``records`` as a new part (or replace the part called ``name``); returns its path"""
+        if not records:
+            return None
+        if name is None:
+            name = f'{self.prefix}-{len(self.parts()) + 1:05d}'
+        path = os.path.join(self.directory, f'{name}.parquet')
+        table = pa.Table.from_pylist(records, schema=self.schema)
+        pq.write_table(table, path + '.tmp', compression='zstd')
+        os.replace(path + '.tmp', path)
+        return path
+
+    def read(self):
+        """All parts as one DataFrame"""
+        parts = self.parts()
+        if not parts:
+            return self.schema.empty_table().to_pandas()
+        return pa.concat_tables(pq.read_table(part, schema=self.schema) for part in parts).to_pandas()
+
+    def finalize(self, parquet_path=None, csv_path=None):
+        """Concatenate the parts into final files, holding one part in memory at a time.
+        Returns the number of rows written."""
+        parquet_writer = pq.ParquetWriter(parquet_path, self.schema, compression='zstd') if parquet_path else None
+        csv_writer = pa_csv.CSVWriter(csv_path, self.schema) if csv_path else None
+        rows = 0
+        try:
+            for part in self.parts():
+                table = pq.read_table(part, schema=self.schema)
+                rows += table.num_rows
+                if parquet_writer:
+                    parquet_writer.write_table(table)
+                if csv_writer:
+                    csv_writer.write_table(table)
+        finally:
+            if parquet_writer:
+                parquet_writer.close()
+            if csv_writer:
+                csv_writer.close()
+        return rows
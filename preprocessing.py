@@ -0,0 +1,185 @@
+import ast
+import json
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from nltk.stem.porter import PorterStemmer
+
+# Only the columns the recommender uses are ever parsed
+USECOLS = ["title", "author", "rating", "description", "genres", "likedPercent", "bbeScore"]
+OUTPUT_COLUMNS = ["title", "Tags", "rating", "bbeScore", "author_alone"]
+
+ps = PorterStemmer()
+
+
+def stemming(text):
+    return " ".join(ps.stem(word) for word in text.split())
+
+
+class CachedStemmer:
+    """Porter stemming backed by a bounded token -> stem LRU cache.
+
+    Descriptions reuse the same few thousand words constantly, so almost every token
+    is a cache hit and ``PorterStemmer.stem`` only runs once per distinct word. Output
+    is identical to ``stemming``.
+    """
+
+    def __init__(self, maxsize=500000, cache=None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._stemmer = PorterStemmer()
+        self._cache = OrderedDict(cache or {})
+        # When set to a dict, every newly stemmed word is also recorded here
+        self.learned = None
+
+    def stem(self, word):
+        cache = self._cache
+        stem = cache.get(word)
+        if stem is not None:
+            self.hits += 1
+            cache.move_to_end(word)
+            return stem
+        self.misses += 1
+        stem = cache[word] = self._stemmer.stem(word)
+        if self.learned is not None:
+            self.learned[word] = stem
+        if len(cache) > self.maxsize:
+            cache.popitem(last=False)
+        return stem
+
+    def __call__(self, text):
+        return " ".join(self.stem(word) for word in text.split())
+
+    def update(self, entries):
+        for word, stem in entries.items():
+            self._cache[word] = stem
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._cache), "hit_rate": self.hit_rate}
+
+    def save(self, path):
+        """Persist the cache (e.g. next to the model artifact) so the next run starts warm"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self._cache, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, maxsize=500000):
+        with open(path, encoding="utf-8") as f:
+            return cls(maxsize=maxsize, cache=json.load(f))
+
+
+_worker_stemmer = None
+
+
+def _init_stem_worker(maxsize, cache):
+    global _worker_stemmer
+    _worker_stemmer = CachedStemmer(maxsize=maxsize, cache=cache)
+
+
+def _stem_shard(texts):
+    hits, misses = _worker_stemmer.hits, _worker_stemmer.misses
+    _worker_stemmer.learned = {}
+    stemmed = [_worker_stemmer(text) for text in texts]
+    return stemmed, _worker_stemmer.hits - hits, _worker_stemmer.misses - misses, _worker_stemmer.learned
+
+
+def stem_pool(stemmer, processes):
+    """Process pool whose workers start with a copy of ``stemmer``'s cache"""
+    return ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=_init_stem_worker,
+        initargs=(stemmer.maxsize, dict(stemmer._cache)),
+    )
+
+
+def stem_texts(texts, stemmer, executor=None, shard_size=2000):
+    """Stem a column of texts, sharded across ``executor`` workers when one is given.
+
+    Worker hit/miss counts and newly stemmed words are merged back into ``stemmer``,
+    so its stats cover the whole run and a saved cache includes every worker's work.
+    """
+    texts = list(texts)
+    if executor is None:
+        return [stemmer(text) for text in texts]
+
+    shards = [texts[i:i + shard_size] for i in range(0, len(texts), shard_size)]
+    stemmed = []
+    for shard_result, hits, misses, learned in executor.map(_stem_shard, shards):
+        stemmed.extend(shard_result)
+        stemmer.hits += hits
+        stemmer.misses += misses
+        stemmer.update(learned)
+    return stemmed
+
+
+default_stemmer = CachedStemmer()
+
+
+def clean_author(author):
+    """Keep only the primary author: first name listed, lowercased, without bracketed titles"""
+    if not isinstance(author, str):
+        return author
+    return author.split(",")[0].strip().lower().split("(")[0].strip()
+
+
+def build_tags(author_alone, description, genres):
+    """Author + description words + genre list, the same (unstemmed) token bag the notebook builds"""
+    tokens = [author_alone.replace(" ", "")] if isinstance(author_alone, str) else []
+    tokens.extend(description.split())
+    tokens.extend(genre.replace(" ", "") for genre in genres)
+    return " ".join(tokens).lower()
+
+
+def clean_chunk(chunk, stemmer=None, executor=None):
+    """Turn one raw CSV chunk into finished title/Tags/rating/bbeScore/author_alone rows"""
+    stemmer = stemmer or default_stemmer
+    chunk = chunk.dropna(subset=["likedPercent"])
+    author_alone = [clean_author(author) for author in chunk["author"]]
+    descriptions = chunk["description"].fillna("NA")
+    tags = [
+        build_tags(author, description, ast.literal_eval(genres))
+        for author, description, genres in zip(author_alone, descriptions, chunk["genres"])
+    ]
+    return pd.DataFrame({
+        "title": chunk["title"].to_numpy(),
+        "Tags": stem_texts(tags, stemmer, executor=executor),
+        "rating": chunk["rating"].to_numpy(),
+        "bbeScore": chunk["bbeScore"].to_numpy(),
+        "author_alone": pd.array(author_alone, dtype="string"),
+    }, columns=OUTPUT_COLUMNS)
+
+
+def iter_tag_chunks(path, chunksize=10000, stemmer=None, processes=1):
+    """Stream ``Books_dataset.csv`` and yield finished Tags frames one chunk at a time.
+
+    Only ``USECOLS`` are read and each chunk is cleaned in a single pass, so peak memory
+    is bounded by ``chunksize`` rather than by the size of the catalogue. With
+    ``processes > 1`` the stemming of every chunk is sharded over one process pool.
+    """
+    stemmer = stemmer or default_stemmer
+    executor = stem_pool(stemmer, processes) if processes > 1 else None
+    try:
+        for chunk in pd.read_csv(path, usecols=USECOLS, chunksize=chunksize):
+            cleaned = clean_chunk(chunk, stemmer=stemmer, executor=executor)
+            if len(cleaned):
+                yield cleaned
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def load_tag_frame(path, chunksize=10000, stemmer=None, processes=1):
+    """Materialize the streamed chunks into one positionally indexed DataFrame"""
+    chunks = list(iter_tag_chunks(path, chunksize=chunksize, stemmer=stemmer, processes=processes))
+    if not chunks:
+        return pd.DataFrame(columns=OUTPUT_COLUMNS)
+    return pd.concat(chunks, ignore_index=True)
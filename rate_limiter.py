@@ -0,0 +1,45 @@
+import asyncio
+import time
+from threading import Lock
+
+
+class TokenBucket:
+    """Token-bucket rate limiter shared by every worker hitting the same site.
+
+    Allows ``rate`` requests per second on average with bursts of up to ``burst``.
+    ``acquire()`` blocks the calling thread; ``acquire_async()`` awaits without
+    blocking the event loop. Both draw from the same bucket.
+    """
+
+    def __init__(self, rate, burst=1, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._tokens = burst
+        self._updated = clock()
+        self._lock = Lock()
+
+    def _reserve(self):
+        """Take a token now, or return how long to wait before trying again"""
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self._reserve()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        while True:
+            wait = self._reserve()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
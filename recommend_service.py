@@ -0,0 +1,280 @@
+"""Asyncio HTTP service for book recommendations.
+
+Loads the model artifact once and serves:
+
+    GET /recommend?title=<title>&n=<n>   recommendations as JSON
+    GET /metrics                         latency histograms, batch sizes and cache stats
+    GET /health                          model version
+
+Concurrent requests that miss the result cache are collected for a few milliseconds
+and scored together with one sparse matrix product. Only the standard library is
+used for the server itself, so it runs locally with no external services:
+
+    python recommend_service.py --artifacts artifacts --port 8080
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from model_artifact import SEARCH_BACKENDS, load_model_artifact
+from recommendation_cache import RecommendationCache, popular_rows
+from recommender import cosine_operands
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MAX_N = 100
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class Histogram:
+    """Fixed-bucket histogram with percentile estimates (latencies in ms, batch sizes)"""
+
+    def __init__(self, buckets=(0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)):
+        self.buckets = np.array(buckets, dtype=np.float64)
+        self.counts = np.zeros(len(buckets) + 1, dtype=np.int64)
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[np.searchsorted(self.buckets, value)] += 1
+        self.total += value
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile"""
+        total = self.counts.sum()
+        if not total:
+            return 0.0
+        bucket = int(np.searchsorted(np.cumsum(self.counts), q / 100 * total))
+        return float(self.buckets[bucket]) if bucket < len(self.buckets) else float('inf')
+
+    def snapshot(self):
+        total = int(self.counts.sum())
+        labels = [f'le_{b:g}' for b in self.buckets] + ['le_inf']
+        return {
+            'count': total,
+            'mean': self.total / total if total else 0.0,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            'buckets': dict(zip(labels, self.counts.tolist())),
+        }
+
+
+class MicroBatcher:
+    """Collects concurrent (row, n) requests for ``window_ms`` and scores them in one call.
+
+    ``compute(rows, n)`` must return per-row (ids, scores) arrays sorted best first;
+    it runs in the default executor so the event loop keeps accepting requests.
+    """
+
+    def __init__(self, compute, window_ms=3, max_batch=256):
+        self.compute = compute
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.batch_sizes = Histogram(buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+        self._pending = []
+        self._flush_task = None
+        # The event loop only keeps weak references to tasks; hold running flushes here
+        self._running = set()
+
+    async def submit(self, row, n):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, n, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush_now()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        return await future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        self._flush_task = None
+        await self._run(self._take())
+
+    def _flush_now(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        task = asyncio.create_task(self._run(self._take()))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    def _take(self):
+        batch, self._pending = self._pending, []
+        return batch
+
+    async def _run(self, batch):
+        if not batch:
+            return
+        self.batch_sizes.observe(len(batch))
+        rows = [row for row, _, _ in batch]
+        n_max = max(n for _, n, _ in batch)
+        try:
+            ids, scores = await asyncio.get_running_loop().run_in_executor(None, self.compute, rows, n_max)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for i, (_, n, future) in enumerate(batch):
+            if not future.done():
+                future.set_result((ids[i][:n], scores[i][:n]))
+
+
+class RecommendService:
+    """Request handling on top of a loaded model, a result cache and a micro-batcher"""
+
+    def __init__(self, model, window_ms=3, max_batch=256, cache=None, prewarm=0, backend='tfidf'):
+        self.model = model
+        self.backend = backend
+        self.cache = cache or RecommendationCache()
+        self.cache.set_model_version(model.version)
+        self.batcher = MicroBatcher(self._compute, window_ms=window_ms, max_batch=max_batch)
+        self.latency = {'recommend': Histogram(), 'other': Histogram()}
+        # Build the title indexes now rather than inside the event loop on the first query
+        model.build_indexes()
+        if backend == 'tfidf':
+            # The artifact stores unit-row CSR, so this only builds the transpose every batch reuses
+            cosine_operands(model.tfidf_matrix)
+        else:
+            model.dense_index(backend)
+        if prewarm:
+            self.cache.prewarm(popular_rows(model.bbe_score, prewarm), 5, model.version, self._compute)
+
+    def _compute(self, rows, n):
+        return self.model.similar(rows, n, self.backend)
+
+    async def recommend(self, title, n):
+        row = self.model.find_book(title)
+        value = self.cache.get(row, n, self.model.version)
+        if value is None:
+            value = await self.batcher.submit(row, n)
+            self.cache.put(row, n, self.model.version, value)
+        ids, scores = value
+        return {
+            'query': title,
+            'book': self.model.titles[row],
+            'version': self.model.version,
+            'results': [
+                {'title': self.model.titles[i], 'score': float(score), 'rating': _float_or_none(self.model.rating[i])}
+                # IVF returns -1 padding when the probed buckets hold fewer than n books
+                for i, score in zip(ids.tolist(), scores.tolist()) if i >= 0
+            ],
+        }
+
+    def metrics(self):
+        return {
+            'version': self.model.version,
+            'backend': self.backend,
+            'latency': {route: histogram.snapshot() for route, histogram in self.latency.items()},
+            'batch_size': self.batcher.batch_sizes.snapshot(),
+            'cache': self.cache.stats(),
+        }
+
+    async def handle(self, method, target):
+        """Route one request; returns (status, payload dict)"""
+        if method != 'GET':
+            return 405, {'error': 'only GET is supported'}
+        url = urlsplit(target)
+        params = parse_qs(url.query)
+        if url.path == '/recommend':
+            title = params.get('title', [''])[0]
+            if not title:
+                return 400, {'error': 'missing title'}
+            try:
+                n = int(params.get('n', ['5'])[0])
+            except ValueError:
+                return 400, {'error': 'n must be an integer'}
+            if not 1 <= n <= MAX_N:
+                return 400, {'error': f'n must be between 1 and {MAX_N}'}
+            try:
+                return 200, await self.recommend(title, n)
+            except KeyError:
+                return 404, {'error': f'no book matches {title!r}'}
+        if url.path == '/metrics':
+            return 200, self.metrics()
+        if url.path == '/health':
+            return 200, {'status': 'ok', 'version': self.model.version}
+        return 404, {'error': f'unknown path {url.path}'}
+
+    async def serve_connection(self, reader, writer):
+        """Minimal HTTP/1.1 handling with keep-alive; request bodies are ignored"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                start = time.perf_counter()
+                try:
+                    method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                    status, payload = await self.handle(method, target)
+                except ValueError:
+                    status, payload = 400, {'error': 'malformed request line'}
+                except Exception as e:
+                    logger.error(f"❌ Request failed: {str(e)}")
+                    status, payload = 500, {'error': 'internal error'}
+                route = 'recommend' if request_line.startswith(b'GET /recommend') else 'other'
+                self.latency[route].observe((time.perf_counter() - start) * 1000)
+
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8080):
+        return await asyncio.start_server(self.serve_connection, host, port)
+
+
+def _float_or_none(value):
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+async def serve(args):
+    model = load_model_artifact(args.artifacts)
+    service = RecommendService(model, window_ms=args.window_ms, max_batch=args.max_batch, prewarm=args.prewarm,
+                               backend=args.backend)
+    server = await service.start(args.host, args.port)
+    logger.info(f"🚀 Serving model {model.version} ({len(model.titles)} books) on http://{args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Book recommendation HTTP service")
+    parser.add_argument('--artifacts', default='artifacts')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--window-ms', type=float, default=3)
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--prewarm', type=int, default=1000, help="pre-warm the cache with this many popular books")
+    parser.add_argument('--backend', choices=SEARCH_BACKENDS, default='tfidf',
+                        help="neighbor search: sparse TF-IDF, or exact/IVF search over the LSA embeddings")
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
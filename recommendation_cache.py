@@ -0,0 +1,140 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+from recommender import top_n
+
+# Rough per-entry cost of the key tuple, OrderedDict slot and array headers
+ENTRY_OVERHEAD_BYTES = 400
+
+
+class RecommendationCache:
+    """LRU + TTL cache of recommendation results keyed by (book id, n, model version).
+
+    Values are the (neighbor ids, scores) arrays a recommender returns. The cache is
+    bounded by a memory budget (and optionally an entry count); the least recently
+    used entries are evicted first and entries older than ``ttl`` seconds are treated
+    as misses. Switching the model version drops every entry of older versions.
+    """
+
+    def __init__(self, max_bytes=64 * 2**20, max_entries=None, ttl=3600, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.model_version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _size(value):
+        return sum(array.nbytes for array in value) + ENTRY_OVERHEAD_BYTES
+
+    def _drop(self, key):
+        _, value = self._entries.pop(key)
+        self._bytes -= self._size(value)
+
+    def get(self, book_id, n, model_version):
+        key = (book_id, n, model_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if self.ttl is not None and self.clock() - stored_at > self.ttl:
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, book_id, n, model_version, value):
+        key = (book_id, n, model_version)
+        # Copy: values are usually row views of a batch result, which would keep the
+        # whole batch alive while only the row's bytes count against the budget
+        value = tuple(np.array(array, copy=True) for array in value)
+        size = self._size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (self.clock(), value)
+            self._bytes += size
+            while self._bytes > self.max_bytes or (self.max_entries and len(self._entries) > self.max_entries):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def get_many(self, book_ids, n, model_version, compute):
+        """Look up many books at once; misses are computed together by one ``compute(rows, n)`` call.
+
+        ``compute`` must return per-row (ids, scores) arrays, e.g. ``similar_rows``.
+        """
+        results = [self.get(book_id, n, model_version) for book_id in book_ids]
+        missing = [i for i, value in enumerate(results) if value is None]
+        if missing:
+            ids, scores = compute([book_ids[i] for i in missing], n)
+            for position, i in enumerate(missing):
+                results[i] = (ids[position], scores[position])
+                self.put(book_ids[i], n, model_version, results[i])
+        return results
+
+    def set_model_version(self, model_version):
+        """Point the cache at a (re)built model artifact, dropping results of older versions"""
+        with self._lock:
+            if model_version == self.model_version:
+                return
+            self.model_version = model_version
+            for key in [key for key in self._entries if key[2] != model_version]:
+                self._drop(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def prewarm(self, book_ids, n, model_version, compute, batch_size=1024):
+        """Fill the cache for e.g. the most popular books before taking traffic"""
+        book_ids = list(book_ids)
+        for start in range(0, len(book_ids), batch_size):
+            batch = book_ids[start:start + batch_size]
+            ids, scores = compute(batch, n)
+            for position, book_id in enumerate(batch):
+                self.put(book_id, n, model_version, (ids[position], scores[position]))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
+
+
+def popular_rows(bbe_score, count=5000):
+    """Row ids of the ``count`` highest-bbeScore books, the usual pre-warm list"""
+    bbe_score = np.nan_to_num(np.asarray(bbe_score, dtype=np.float32), nan=-np.inf)
+    rows, _ = top_n(bbe_score, count)
+    return rows.tolist()
@@ -0,0 +1,195 @@
+import weakref
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+# id(matrix) -> (weak reference to the matrix, unit-row CSR, CSR transpose)
+_operands = {}
+_operands_lock = Lock()
+
+
+def top_n(scores, n, exclude=None):
+    """Return the column ids and scores of the n highest scores per row, best first.
+
+    Uses argpartition so only the n winners are sorted instead of the whole row.
+    ``scores`` may be a single row or a 2-D batch of rows; ``exclude`` gives one column
+    per row to skip (e.g. the query book itself).
+    """
+    scores = np.array(scores, dtype=np.float32, ndmin=1)
+    single = scores.ndim == 1
+    scores = np.atleast_2d(scores)
+    if exclude is not None:
+        scores[np.arange(scores.shape[0]), np.asarray(exclude).reshape(-1)] = -np.inf
+
+    n = max(0, min(n, scores.shape[1] - (exclude is not None)))
+    if n == 0:
+        top = np.empty((scores.shape[0], 0), dtype=np.int64)
+    elif n == scores.shape[1]:
+        top = np.broadcast_to(np.arange(n), scores.shape).copy()
+    else:
+        top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+    if single:
+        return top[0], top_scores[0]
+    return top, top_scores
+
+
+def _has_unit_rows(matrix):
+    squared_norms = np.asarray(matrix.multiply(matrix).sum(axis=1)).reshape(-1)
+    return bool(np.all((np.abs(squared_norms - 1) < 1e-3) | (squared_norms == 0)))
+
+
+def cosine_operands(matrix):
+    """(unit-row CSR, CSR transpose) of ``matrix``, built once per matrix object.
+
+    Every similarity query is ``matrix[rows] @ transpose``, so the catalogue-wide work
+    (normalizing, transposing) is done on the first call and reused afterwards. Rows
+    that are already unit length, as TF-IDF rows are, are used as they are, so a
+    memory-mapped artifact matrix is never copied.
+    """
+    key = id(matrix)
+    with _operands_lock:
+        entry = _operands.get(key)
+        if entry is not None and entry[0]() is matrix:
+            return entry[1], entry[2]
+    unit = matrix if sparse.isspmatrix_csr(matrix) else sparse.csr_matrix(matrix)
+    if not _has_unit_rows(unit):
+        unit = normalize(unit, norm='l2')
+    transpose = unit.T.tocsr()
+    with _operands_lock:
+        _operands[key] = (weakref.ref(matrix, lambda _, key=key: _operands.pop(key, None)), unit, transpose)
+    return unit, transpose
+
+
+def similar_rows(matrix, rows, n=5):
+    """Find the n most similar rows of ``matrix`` for each of the query ``rows`` in one product"""
+    unit, transpose = cosine_operands(matrix)
+    rows = np.asarray(rows).reshape(-1)
+    sim_scores = (unit[rows] @ transpose).toarray()
+    return top_n(sim_scores, n, exclude=rows)
+
+
+def topk_for_rows(vectors, rows, k=5, chunk_size=1024):
+    """Find the k most similar books for each of the query ``rows``, chunk by chunk.
+
+    Query rows are stacked and multiplied against the transposed catalogue as one
+    sparse x sparse product per chunk, so only a (chunk_size x n_books) block is ever
+    dense. Returns (len(rows) x k) int32 neighbor ids and float32 cosine scores, best
+    match first, never including the query book itself.
+    """
+    unit, transpose = cosine_operands(vectors)
+    rows = np.asarray(rows, dtype=np.int64).reshape(-1)
+    k = max(0, min(k, unit.shape[0] - 1))
+
+    neighbor_ids = np.empty((len(rows), k), dtype=np.int32)
+    neighbor_scores = np.empty((len(rows), k), dtype=np.float32)
+    if k == 0:
+        return neighbor_ids, neighbor_scores
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        block = (unit[chunk] @ transpose).toarray()
+        top, top_scores = top_n(block, k, exclude=chunk)
+        neighbor_ids[start:start + len(chunk)] = top
+        neighbor_scores[start:start + len(chunk)] = top_scores
+
+    return neighbor_ids, neighbor_scores
+
+
+def build_topk_index(vectors, k=50, block_size=1024):
+    """Precompute the k most similar books for every row, one block of rows at a time.
+
+    Only a (block_size x n_books) slice of the similarity matrix is ever dense, so peak
+    memory stays bounded instead of growing with n_books ** 2. Returns two (n_books x k)
+    arrays: int32 neighbor row ids and float32 cosine scores, best match first. A book
+    is never its own neighbor.
+    """
+    return topk_for_rows(vectors, np.arange(vectors.shape[0]), k, chunk_size=block_size)
+
+
+def neighbors_frame(queries, neighbor_ids, neighbor_scores, titles):
+    """Flatten per-query neighbor arrays into a tidy query/rank/title/score DataFrame"""
+    n_queries, k = neighbor_ids.shape
+    titles = np.asarray(titles, dtype=object)
+    return pd.DataFrame({
+        'query': np.repeat(np.asarray(queries, dtype=object), k),
+        'rank': np.tile(np.arange(1, k + 1), n_queries),
+        'title': titles[neighbor_ids.reshape(-1)],
+        'score': neighbor_scores.reshape(-1),
+    })
+
+
+def quality_features(rating, bbe_score, max_rating=5.0):
+    """Per-book rating and popularity signals scaled to [0, 1] for ``rerank``.
+
+    ``bbeScore`` is heavily skewed (a few classics have millions of points), so it is
+    log-scaled before normalizing. Missing values count as 0.
+    """
+    rating = np.nan_to_num(np.asarray(rating, dtype=np.float32) / max_rating, nan=0.0)
+    bbe_score = np.log1p(np.nan_to_num(np.asarray(bbe_score, dtype=np.float32), nan=0.0).clip(min=0))
+    top = bbe_score.max() if len(bbe_score) else 0
+    popularity = bbe_score / top if top > 0 else np.zeros_like(bbe_score)
+    return rating.clip(0, 1), popularity
+
+
+def genre_matrix(genres, sep=", "):
+    """L2-normalized multi-hot genre matrix (one row per book) for the diversity penalty"""
+    vocabulary = {}
+    rows, cols = [], []
+    for row, book_genres in enumerate(genres):
+        if not isinstance(book_genres, str):
+            continue
+        for genre in set(book_genres.split(sep)):
+            rows.append(row)
+            cols.append(vocabulary.setdefault(genre.strip(), len(vocabulary)))
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(len(genres), max(1, len(vocabulary)))
+    )
+    return normalize(matrix, norm='l2')
+
+
+def rerank(candidate_ids, candidate_scores, n=5, rating=None, popularity=None, genres=None,
+           w_similarity=1.0, w_rating=0.1, w_popularity=0.1, diversity=0.0):
+    """Re-rank top-M similarity candidates by a blended score, returning the best n.
+
+    blended = w_similarity * cosine + w_rating * rating + w_popularity * popularity,
+    with ``rating`` / ``popularity`` from ``quality_features``. With ``diversity > 0``
+    and a ``genres`` matrix, picks are made greedily by maximal marginal relevance:
+    each candidate is penalized by ``diversity`` times its highest genre similarity
+    to the books already picked for that query.
+    """
+    candidate_ids = np.atleast_2d(candidate_ids)
+    blended = w_similarity * np.atleast_2d(candidate_scores).astype(np.float32)
+    blended = np.where(np.isfinite(blended), blended, -np.inf)
+    if rating is not None:
+        blended += w_rating * rating[candidate_ids]
+    if popularity is not None:
+        blended += w_popularity * popularity[candidate_ids]
+
+    if not diversity or genres is None:
+        best, best_scores = top_n(blended, n)
+        return np.take_along_axis(candidate_ids, best, axis=1), best_scores
+
+    n_queries, n_candidates = candidate_ids.shape
+    n = min(n, n_candidates)
+    genre_sims = np.stack([(genres[ids] @ genres[ids].T).toarray() for ids in candidate_ids])
+    queries = np.arange(n_queries)
+    picked = np.empty((n_queries, n), dtype=np.int64)
+    picked_scores = np.empty((n_queries, n), dtype=np.float32)
+    max_sim = np.zeros((n_queries, n_candidates), dtype=np.float32)
+    available = np.ones((n_queries, n_candidates), dtype=bool)
+    for step in range(n):
+        mmr = np.where(available, blended - diversity * max_sim, -np.inf)
+        choice = np.argmax(mmr, axis=1)
+        picked[:, step] = choice
+        picked_scores[:, step] = mmr[queries, choice]
+        available[queries, choice] = False
+        max_sim = np.maximum(max_sim, genre_sims[queries, choice])
+    return np.take_along_axis(candidate_ids, picked, axis=1), picked_scores
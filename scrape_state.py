@@ -0,0 +1,110 @@
+"""Persistent per-URL scrape state, so interrupted runs resume where they stopped.
+
+Each URL has a kind ("book" pages for data_scraper.py, "genre" shelves for
+url_scraper.py), a status (pending/done/failed), an attempt count and, once done,
+the extracted record as JSON. Everything lives in one local SQLite file in WAL mode;
+every write is committed immediately, so a crash loses at most the page in flight.
+"""
+import json
+import sqlite3
+import time
+from threading import Lock
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    record TEXT,
+    error TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS urls_kind_status ON urls (kind, status);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class ScrapeState:
+    """SQLite-backed status of every URL the scrapers have been asked to fetch"""
+
+    def __init__(self, path='scrape_state.sqlite'):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = Lock()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def add(self, urls, kind='book'):
+        """Register URLs as pending; ones already known keep their status"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO urls (url, kind, updated_at) VALUES (?, ?, ?)",
+                [(url, kind, time.time()) for url in urls],
+            )
+            self._conn.execute("COMMIT")
+
+    def pending(self, kind='book', max_attempts=None):
+        """URLs not done yet, in insertion order; those out of attempts are left out"""
+        sql = "SELECT url FROM urls WHERE kind = ? AND status != 'done'"
+        params = [kind]
+        if max_attempts is not None:
+            sql += " AND attempts < ?"
+            params.append(max_attempts)
+        return [url for url, in self._execute(sql + " ORDER BY rowid", params)]
+
+    def mark_done(self, url, record=None, kind='book'):
+        self._execute(
+            "INSERT INTO urls (url, kind, status, attempts, record, updated_at) VALUES (?, ?, 'done', 1, ?, ?) "
+            "ON CONFLICT(url) DO UPDATE SET status = 'done', attempts = attempts + 1, record = excluded.record, "
+            "error = NULL, updated_at = excluded.updated_at",
+            (url, kind, json.dumps(record), time.time()),
+        )
+
+    def mark_failed(self, url, error=None, kind='book'):
+        """Count a failed attempt; the URL stays eligible until it runs out of attempts"""
+        self._execute(
+            "INSERT INTO urls (url, kind, status, attempts, error, updated_at) VALUES (?, ?, 'failed', 1, ?, ?) "
+            "ON CONFLICT(url) DO UPDATE SET status = 'failed', attempts = attempts + 1, error = excluded.error, "
+            "updated_at = excluded.updated_at",
+            (url, kind, error, time.time()),
+        )
+
+    def status(self, url):
+        rows = self._execute("SELECT status FROM urls WHERE url = ?", (url,))
+        return rows[0][0] if rows else None
+
+    def record(self, url):
+        rows = self._execute("SELECT record FROM urls WHERE url = ? AND status = 'done'", (url,))
+        return json.loads(rows[0][0]) if rows and rows[0][0] is not None else None
+
+    def records(self, kind='book', since=None):
+        """Extracted records of every done URL of ``kind`` (finished after ``since``), in insertion order"""
+        sql = "SELECT record FROM urls WHERE kind = ? AND status = 'done'"
+        params = [kind]
+        if since is not None:
+            sql += " AND updated_at > ?"
+            params.append(since)
+        rows = self._execute(sql + " ORDER BY rowid", params)
+        return [json.loads(record) for record, in rows if record is not None]
+
+    def counts(self, kind='book'):
+        rows = self._execute("SELECT status, COUNT(*) FROM urls WHERE kind = ? GROUP BY status", (kind,))
+        return dict(rows)
+
+    def get_meta(self, key, default=None):
+        rows = self._execute("SELECT value FROM meta WHERE key = ?", (key,))
+        return json.loads(rows[0][0]) if rows else default
+
+    def set_meta(self, key, value):
+        self._execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
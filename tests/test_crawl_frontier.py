@@ -0,0 +1,42 @@
+from crawl_frontier import CrawlFrontier
+
+PAGE = 'https://www.goodreads.com/shelf/show/fantasy?page=2'
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def crawled_frontier(path, clock, page_ttl=3600):
+    frontier = CrawlFrontier(str(path), page_ttl=page_ttl, clock=clock)
+    assert frontier.claim_page(PAGE, 'fantasy')
+    frontier.claim_books(['https://www.goodreads.com/book/show/1'], 'fantasy')
+    frontier.commit('fantasy')
+    return frontier
+
+
+def test_saved_pages_expire_but_books_do_not(tmp_path):
+    path = tmp_path / 'frontier.npz'
+    clock = FakeClock()
+    assert not crawled_frontier(path, clock).claim_page(PAGE, 'horror')
+
+    clock.now += 1800
+    fresh = CrawlFrontier(str(path), page_ttl=3600, clock=clock)
+    assert not fresh.claim_page(PAGE, 'horror')
+
+    clock.now += 3600
+    later = CrawlFrontier(str(path), page_ttl=3600, clock=clock)
+    assert later.claim_page(PAGE, 'horror')
+    assert later.claim_books(['https://www.goodreads.com/book/show/1'], 'horror') == []
+
+
+def test_zero_ttl_keeps_pages_for_one_run(tmp_path):
+    path = tmp_path / 'frontier.npz'
+    clock = FakeClock()
+    crawled_frontier(path, clock, page_ttl=0)
+
+    assert CrawlFrontier(str(path), page_ttl=0, clock=clock).claim_page(PAGE, 'fantasy')
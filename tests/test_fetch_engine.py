@@ -0,0 +1,160 @@
+import asyncio
+import os
+import threading
+import time
+
+from aiohttp import web
+
+from data_scraper import process_batch_http
+from fetch_engine import FetchEngine
+from scrape_state import ScrapeState
+
+PAGES = os.path.join(os.path.dirname(__file__), 'pages')
+
+
+def saved_page(name):
+    with open(os.path.join(PAGES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+async def serve_and_scrape(engine, routes, paths):
+    """Serve ``routes`` (path -> handler) locally and scrape ``paths`` with ``engine``"""
+    app = web.Application()
+    for path, handler in routes.items():
+        app.router.add_get(path, handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        return await engine.scrape_all([f'http://127.0.0.1:{port}{path}' for path in paths])
+    finally:
+        await runner.cleanup()
+
+
+def page_handler(name):
+    async def handler(request):
+        return web.Response(text=saved_page(name), content_type='text/html')
+    return handler
+
+
+def status_handler(status, hits):
+    async def handler(request):
+        hits.append(request.path)
+        return web.Response(status=status)
+    return handler
+
+
+def test_scrapes_saved_pages_without_a_browser():
+    engine = FetchEngine(rate=100, burst=10, selenium_fallback=False)
+    routes = {
+        '/book/show/8921': page_handler('hound_of_the_baskervilles.html'),
+        '/book/show/1885': page_handler('pride_and_prejudice.html'),
+    }
+    records = asyncio.run(serve_and_scrape(engine, routes, list(routes)))
+
+    assert [record['title'] for record in records] == ['The Hound of the Baskervilles', 'Pride and Prejudice']
+    assert records[0]['author'] == 'Arthur Conan Doyle'
+    assert records[0]['rating_count'] == 412733
+    assert records[1]['genres'] == 'Classics, Fiction, Romance'
+    assert engine.stats == {'fetched': 2, 'parsed': 2, 'fallbacks': 0, 'failed': 0}
+
+
+def test_retries_503_but_not_404():
+    hits = []
+    flaky = []
+
+    async def recovers(request):
+        flaky.append(request.path)
+        if len(flaky) == 1:
+            return web.Response(status=503)
+        return web.Response(text=saved_page('pride_and_prejudice.html'), content_type='text/html')
+
+    engine = FetchEngine(rate=100, burst=10, retries=2, backoff=0.01, selenium_fallback=False)
+    routes = {'/book/show/flaky': recovers, '/book/show/missing': status_handler(404, hits)}
+    records = asyncio.run(serve_and_scrape(engine, routes, list(routes)))
+
+    assert [record['title'] for record in records] == ['Pride and Prejudice']
+    assert len(flaky) == 2
+    assert hits == ['/book/show/missing']
+    assert engine.stats['failed'] == 1
+
+
+def test_no_backoff_after_the_last_attempt():
+    hits = []
+    engine = FetchEngine(rate=100, burst=10, retries=1, backoff=0.2, selenium_fallback=False)
+    start = time.perf_counter()
+    records = asyncio.run(serve_and_scrape(engine, {'/book/show/down': status_handler(503, hits)}, ['/book/show/down']))
+
+    # One backoff of 0.2-0.4 s between the two attempts; another after the last would add at least 0.4 s
+    assert records == []
+    assert len(hits) == 2
+    assert time.perf_counter() - start < 0.55
+
+
+def test_unrendered_page_falls_back_to_browser():
+    engine = FetchEngine(rate=100, burst=10)
+    rendered = []
+
+    def scrape_with_browser(url, bucket):
+        rendered.append(url)
+        return {'title': 'The Time Machine', 'author': 'H.G. Wells', 'rating': 3.89, 'rating_count': 512604,
+                'description': 'A Victorian scientist travels to the year 802,701.', 'genres': 'Classics'}
+
+    engine._scrape_with_browser = scrape_with_browser
+    routes = {
+        '/book/show/2493': page_handler('time_machine_unrendered.html'),
+        '/book/show/8921': page_handler('hound_of_the_baskervilles.html'),
+    }
+    records = asyncio.run(serve_and_scrape(engine, routes, list(routes)))
+
+    assert len(rendered) == 1 and rendered[0].endswith('/book/show/2493')
+    assert records[0]['description'].startswith('A Victorian scientist')
+    assert engine.stats['fallbacks'] == 1
+    engine.close()
+
+
+def test_missing_page_does_not_start_a_browser():
+    engine = FetchEngine(rate=100, burst=10, retries=0)
+    rendered = []
+    engine._scrape_with_browser = lambda url, bucket: rendered.append(url)
+    records = asyncio.run(serve_and_scrape(engine, {'/book/show/gone': status_handler(404, [])}, ['/book/show/gone']))
+
+    assert records == []
+    assert rendered == []
+    assert engine.stats == {'fetched': 0, 'parsed': 0, 'fallbacks': 0, 'failed': 1}
+
+
+def test_http_batch_records_outcomes_in_scrape_state(tmp_path):
+    app = web.Application()
+    app.router.add_get('/book/show/8921', page_handler('hound_of_the_baskervilles.html'))
+    app.router.add_get('/book/show/gone', status_handler(404, []))
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, '127.0.0.1', 0).start())
+    port = runner.addresses[0][1]
+    # process_batch_http runs its own event loop, so the stub server gets a thread of its own
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    state = ScrapeState(str(tmp_path / 'state.sqlite'))
+    urls = [f'http://127.0.0.1:{port}/book/show/8921', f'http://127.0.0.1:{port}/book/show/gone']
+    state.add(urls)
+    engine = FetchEngine(rate=100, burst=10, retries=0, selenium_fallback=False)
+    try:
+        batch_data, dead_letters = process_batch_http(urls, 1, engine, state)
+        # A second batch reuses the engine under a new event loop
+        again, _ = process_batch_http(urls[:1], 2, engine)
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+    assert [book['title'] for book in batch_data] == ['The Hound of the Baskervilles']
+    assert [letter['item'] for letter in dead_letters] == urls[1:]
+    assert state.status(urls[0]) == 'done' and state.status(urls[1]) == 'failed'
+    assert state.pending() == urls[1:]
+    assert [book['title'] for book in again] == ['The Hound of the Baskervilles']
+    state.close()
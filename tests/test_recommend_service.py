@@ -0,0 +1,126 @@
+import asyncio
+import json
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from model_artifact import load_model_artifact, save_model_artifact
+from recommend_service import MicroBatcher, RecommendService
+from recommender import cosine_operands, topk_for_rows
+
+BOOKS = [
+    ('Dune', 'desert planet spice empire'),
+    ('Children of Dune', 'desert planet spice empire heir'),
+    ('Foundation', 'galactic empire psychohistory fall'),
+    ('Pride and Prejudice', 'marriage england manners romance'),
+    ('Emma', 'matchmaking england manners romance'),
+    ('The Hound of the Baskervilles', 'detective moor hound mystery'),
+]
+
+
+def saved_model(tmp_path):
+    """Fit and save a six-book artifact, then load it back like the service does"""
+    titles = [title for title, _ in BOOKS]
+    vectorizer = TfidfVectorizer()
+    tfidf_matrix = vectorizer.fit_transform([tags for _, tags in BOOKS])
+    neighbor_ids, neighbor_scores = topk_for_rows(tfidf_matrix, range(len(titles)), 3)
+    save_model_artifact(str(tmp_path), vectorizer, tfidf_matrix, titles, neighbor_ids, neighbor_scores,
+                        rating=np.linspace(3.5, 4.5, len(titles)), bbe_score=np.arange(len(titles), 0, -1),
+                        version='v1')
+    return load_model_artifact(str(tmp_path))
+
+
+async def get(port, target):
+    """One GET over a fresh connection; returns (status, payload)"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET {target} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.encode('latin-1'))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split(b' ', 2)[1]), json.loads(body)
+
+
+async def serve_and_get(service, targets):
+    """Start ``service`` on a free port and fetch ``targets`` concurrently"""
+    server = await service.start('127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        return await asyncio.gather(*(get(port, target) for target in targets))
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def test_serves_recommendations_over_http(tmp_path):
+    service = RecommendService(saved_model(tmp_path), window_ms=20)
+    dune, emma, metrics, health, unknown, missing, bad_n, no_title = asyncio.run(serve_and_get(service, [
+        '/recommend?title=dune&n=2', '/recommend?title=Emma&n=1', '/metrics', '/health',
+        '/recommend?title=Moby%20Dick', '/nowhere', '/recommend?title=Dune&n=0', '/recommend',
+    ]))
+
+    assert dune[0] == 200
+    assert dune[1]['book'] == 'Dune'
+    assert dune[1]['results'][0]['title'] == 'Children of Dune'
+    assert len(dune[1]['results']) == 2
+    assert emma[1]['results'][0]['title'] == 'Pride and Prejudice'
+    assert health == (200, {'status': 'ok', 'version': 'v1'})
+    assert metrics[1]['backend'] == 'tfidf'
+    assert unknown[0] == 404 and missing[0] == 404
+    assert bad_n[0] == 400 and no_title[0] == 400
+
+
+def test_scores_against_the_saved_unit_rows(tmp_path):
+    model = saved_model(tmp_path)
+    RecommendService(model)
+
+    # The artifact is already unit-normalized CSR, so it is scored as loaded, with no copy
+    unit, transpose = cosine_operands(model.tfidf_matrix)
+    assert unit is model.tfidf_matrix
+    assert transpose.shape == model.tfidf_matrix.shape[::-1]
+
+
+def test_cached_answer_skips_the_batcher(tmp_path):
+    service = RecommendService(saved_model(tmp_path))
+
+    async def twice():
+        first = await service.handle('GET', '/recommend?title=Foundation&n=3')
+        second = await service.handle('GET', '/recommend?title=Foundation&n=3')
+        return first, second
+
+    first, second = asyncio.run(twice())
+    assert first == second
+    assert service.batcher.batch_sizes.snapshot()['count'] == 1
+    assert service.cache.stats()['hits'] == 1
+
+
+def test_micro_batcher_scores_concurrent_requests_together():
+    calls = []
+
+    def compute(rows, n):
+        calls.append((list(rows), n))
+        ids = np.array([[row * 10 + i for i in range(n)] for row in rows])
+        return ids, ids.astype(np.float32)
+
+    async def submit_all(batcher):
+        return await asyncio.gather(*(batcher.submit(row, n) for row, n in [(1, 2), (2, 3), (3, 1)]))
+
+    results = asyncio.run(submit_all(MicroBatcher(compute, window_ms=20)))
+
+    assert calls == [([1, 2, 3], 3)]
+    assert [ids.tolist() for ids, _ in results] == [[10, 11], [20, 21, 22], [30]]
+
+
+def test_micro_batcher_flushes_a_full_batch_immediately():
+    calls = []
+
+    def compute(rows, n):
+        calls.append(list(rows))
+        return np.zeros((len(rows), n), dtype=np.int64), np.zeros((len(rows), n), dtype=np.float32)
+
+    async def submit_all(batcher):
+        return await asyncio.gather(*(batcher.submit(row, 1) for row in range(5)))
+
+    # A 10 s window would time the test out if a full batch still waited for it
+    asyncio.run(asyncio.wait_for(submit_all(MicroBatcher(compute, window_ms=10000, max_batch=5)), timeout=2))
+    assert calls == [[0, 1, 2, 3, 4]]
@@ -0,0 +1,127 @@
+import numpy as np
+
+from catalogue_index import load_arrays, normalize_title, save_arrays
+from recommender import top_n
+
+
+def trigrams(text):
+    """Distinct character trigrams of a normalized string, padded so word edges count"""
+    text = f'  {text} '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _book_trigrams(titles, authors=None, first_row=0):
+    """Trigram -> row postings and per-book trigram counts for a run of books"""
+    titles = list(titles)
+    authors = [''] * len(titles) if authors is None else list(authors)
+    postings = {}
+    gram_counts = np.empty(len(titles), dtype=np.int32)
+    for i, (title, author) in enumerate(zip(titles, authors)):
+        text = normalize_title(title)
+        if isinstance(author, str) and author:
+            text = f'{text} {normalize_title(author)}'
+        grams = trigrams(text)
+        gram_counts[i] = len(grams)
+        for gram in grams:
+            postings.setdefault(gram, []).append(first_row + i)
+    return postings, gram_counts
+
+
+class TitleSearchIndex:
+    """Character-trigram inverted index over normalized titles and authors.
+
+    Resolves free-text queries ("twilight meyer", "hary poter") to catalogue row ids.
+    Scoring is an asymmetric Tversky index: query trigrams missing from a book cost
+    full weight, extra book trigrams (the author, a subtitle) only ``extra_weight``,
+    so a bare title still ranks its book first. Each trigram maps to an int32 posting
+    array, so a query is one concatenate plus one bincount over the postings it
+    touches, with no per-book Python work. The postings live in flat arrays (sorted
+    trigrams, one concatenated posting array and its offsets) that ``save`` / ``load``
+    round-trip through memory-mapped ``.npy`` files.
+    """
+
+    ARRAYS = ('grams', 'postings', 'offsets', 'gram_counts')
+
+    def __init__(self, titles, authors=None, extra_weight=0.2):
+        self.extra_weight = extra_weight
+        postings, gram_counts = _book_trigrams(titles, authors)
+        grams = sorted(postings)
+        offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+        np.cumsum([len(postings[gram]) for gram in grams], out=offsets[1:])
+        flat = np.fromiter((row for gram in grams for row in postings[gram]), dtype=np.int32, count=offsets[-1])
+        self._init(np.array(grams, dtype='<U3'), flat, offsets, gram_counts)
+
+    def extended(self, titles, authors=None):
+        """A new index that also covers ``titles``, appended as rows len(self), len(self) + 1, ...
+
+        Only the new books are tokenized; their postings are merged into the existing
+        arrays with one stable sort.
+        """
+        postings, new_counts = _book_trigrams(titles, authors, first_row=len(self))
+        grams = np.union1d(self._grams, np.array(list(postings), dtype='<U3'))
+        old_ids = np.repeat(np.searchsorted(grams, self._grams), np.diff(self._offsets))
+        new_grams = [gram for gram, rows in postings.items() for _ in rows]
+        new_ids = np.searchsorted(grams, np.array(new_grams, dtype='<U3'))
+        new_rows = np.fromiter((row for rows in postings.values() for row in rows), dtype=np.int32, count=len(new_grams))
+
+        gram_ids = np.concatenate([old_ids, new_ids])
+        order = np.argsort(gram_ids, kind='stable')
+        offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(gram_ids, minlength=len(grams)), out=offsets[1:])
+
+        index = type(self).__new__(type(self))
+        index.extra_weight = self.extra_weight
+        index._init(grams, np.concatenate([self._postings, new_rows])[order], offsets,
+                    np.concatenate([self._gram_counts, new_counts]))
+        return index
+
+    def _init(self, grams, postings, offsets, gram_counts):
+        self._grams = grams
+        self._postings = postings
+        self._offsets = offsets
+        self._gram_counts = gram_counts
+
+    def save(self, path, prefix='trigram'):
+        save_arrays(path, prefix, grams=self._grams, postings=self._postings, offsets=self._offsets,
+                     gram_counts=self._gram_counts)
+
+    @classmethod
+    def load(cls, path, prefix='trigram', extra_weight=0.2, mmap_mode='r'):
+        """Memory-map an index written by ``save``"""
+        index = cls.__new__(cls)
+        index.extra_weight = extra_weight
+        index._init(*load_arrays(path, prefix, cls.ARRAYS, mmap_mode))
+        return index
+
+    def _posting_lists(self, grams):
+        grams = np.array(list(grams), dtype='<U3')
+        positions = np.searchsorted(self._grams, grams).clip(max=max(len(self._grams) - 1, 0))
+        found = positions[self._grams[positions] == grams] if len(self._grams) else positions[:0]
+        return [self._postings[self._offsets[i]:self._offsets[i + 1]] for i in found]
+
+    def __len__(self):
+        return len(self._gram_counts)
+
+    def search(self, query, limit=10, min_score=0.0):
+        """Return (rows, scores) of the best matches, best first, scores in [0, 1]"""
+        grams = trigrams(normalize_title(query))
+        lists = self._posting_lists(grams)
+        if not lists:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+        hits = np.bincount(np.concatenate(lists), minlength=len(self))
+        candidates = np.flatnonzero(hits)
+        shared = hits[candidates]
+        extra = self._gram_counts[candidates] - shared
+        scores = shared / (len(grams) + self.extra_weight * extra)
+
+        best, best_scores = top_n(scores, limit)
+        keep = best_scores >= min_score
+        return candidates[best[keep]].astype(np.int32), best_scores[keep]
+
+    def resolve(self, query, min_score=0.3):
+        """Best matching row for a query, or KeyError when nothing is close enough"""
+        rows, _ = self.search(query, limit=1, min_score=min_score)
+        if len(rows) == 0:
+            raise KeyError(query)
+        return int(rows[0])
@@ -6,11 +6,20 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from bs4 import BeautifulSoup
+import argparse
+import concurrent.futures
+import functools
 import logging
+import os
+from browser_pool import BrowserPool, driver_path
+from crawl_frontier import CrawlFrontier
+from link_extractor import extract_book_links
+from output_writer import URL_SCHEMA, PartWriter
+from rate_limiter import TokenBucket
+from scrape_state import ScrapeState
 
 # Set up detailed logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -69,7 +78,7 @@ def setup_driver():
     
     try:
         logger.info("📥 Setting up ChromeDriver...")
-        service = Service(ChromeDriverManager().install())
+        service = Service(driver_path())
         service.creation_flags = 0
         
         browser = webdriver.Chrome(service=service, options=opts)
@@ -83,265 +92,200 @@ def setup_driver():
         logger.error(f"❌ Failed to setup Chrome WebDriver: {str(e)}")
         raise
 
-def scrape_genre_extensively(browser, genre_url, target_books=600):
-    """Enhanced scraping with multiple strategies to get more books"""
-    book_urls = set()  # Use set to avoid duplicates automatically
+def polite_get(browser, url, limiter=None):
+    """Load a page, first waiting for a token from the shared rate limiter if there is one"""
+    if limiter is not None:
+        limiter.acquire()
+    browser.get(url)
+
+# Fallback strategies once plain pagination runs dry
+sorting_options = [
+    "?sort=rating",
+    "?sort=num_ratings", 
+    "?sort=date_added",
+    "?sort=date_pub",
+    "?sort=title"
+]
+
+search_terms = [
+    "award", "bestseller", "popular", "classic", "novel", "fiction",
+    "mystery", "thriller", "romance", "adventure", "series", "book"
+]
+
+def genre_strategies(genre_url, max_pages=100):
+    """(name, page URLs, fetch options) for each way of listing a genre's books, in priority order"""
     genre_name = genre_url.split('/')[-1]
     
-    logger.info(f"📚 Starting extensive scraping of {genre_name} (target: {target_books} books)")
-    
     # Strategy 1: Regular pagination
-    page_num = 1
-    max_pages = 100  # Increased from 50
+    yield 'pagination', [genre_url] + [f"{genre_url}?page={page}" for page in range(2, max_pages + 1)], {'settle': (2, 4)}
     
-    logger.info("🔥 Strategy 1: Regular pagination")
-    while len(book_urls) < target_books and page_num <= max_pages:
-        try:
-            if page_num == 1:
-                page_url = genre_url
-            else:
-                page_url = f"{genre_url}?page={page_num}"
-            
-            logger.info(f"🔍 Page {page_num} - Current: {len(book_urls)}/{target_books}")
-            browser.get(page_url)
-            
-            WebDriverWait(browser, 15).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
-            time.sleep(random.uniform(2, 4))
-            
-            # Multiple selectors for book links
-            book_selectors = [
-                'a[href*="/book/show/"]',
-                'a[href*="/book/"]',
-                '.bookTitle',
-                '.bookCover a'
-            ]
-            
-            page_books_added = 0
-            for selector in book_selectors:
-                elements = browser.find_elements(By.CSS_SELECTOR, selector)
-                for element in elements:
-                    try:
-                        url = element.get_attribute('href')
-                        if url and '/book/show/' in url:
-                            clean_url = url.split('?')[0].split('#')[0]
-                            if clean_url not in book_urls:
-                                book_urls.add(clean_url)
-                                page_books_added += 1
-                                
-                                if len(book_urls) >= target_books:
-                                    break
-                    except:
-                        continue
-                
-                if len(book_urls) >= target_books:
-                    break
-            
-            logger.info(f"✅ Added {page_books_added} new books from page {page_num}")
-            
-            if page_books_added == 0:
-                logger.info(f"🔚 No new books on page {page_num}")
-                break
-            
-            page_num += 1
-            time.sleep(random.uniform(1, 3))
-            
-        except Exception as e:
-            logger.error(f"❌ Error on page {page_num}: {str(e)}")
-            page_num += 1
-            continue
+    # Strategy 2: Different sorting methods, 20 pages each
+    for sort_option in sorting_options:
+        yield f'sort {sort_option}', [f"{genre_url}{sort_option}&page={page}" for page in range(1, 21)], {'settle': (1, 2)}
     
-    # Strategy 2: Different sorting methods if still need more books
-    if len(book_urls) < target_books:
-        logger.info(f"🔥 Strategy 2: Different sorting (current: {len(book_urls)})")
-        
-        sorting_options = [
-            "?sort=rating",
-            "?sort=num_ratings", 
-            "?sort=date_added",
-            "?sort=date_pub",
-            "?sort=title"
-        ]
-        
-        for sort_option in sorting_options:
-            if len(book_urls) >= target_books:
-                break
-                
-            logger.info(f"🔄 Trying sort: {sort_option}")
-            
-            for page in range(1, 21):  # 20 pages per sorting method
-                try:
-                    url = f"{genre_url}{sort_option}&page={page}"
-                    browser.get(url)
-                    
-                    WebDriverWait(browser, 10).until(
-                        EC.presence_of_element_located((By.TAG_NAME, "body"))
-                    )
-                    time.sleep(random.uniform(1, 2))
-                    
-                    elements = browser.find_elements(By.CSS_SELECTOR, 'a[href*="/book/show/"]')
-                    page_added = 0
-                    
-                    for element in elements:
-                        try:
-                            url = element.get_attribute('href')
-                            if url and '/book/show/' in url:
-                                clean_url = url.split('?')[0].split('#')[0]
-                                if clean_url not in book_urls:
-                                    book_urls.add(clean_url)
-                                    page_added += 1
-                                    
-                                    if len(book_urls) >= target_books:
-                                        break
-                        except:
-                            continue
-                    
-                    if page_added == 0:
-                        break
-                        
-                    if len(book_urls) >= target_books:
-                        break
-                        
-                except Exception as e:
-                    continue
+    # Strategy 3: Search within genre, 5 pages per search term
+    for term in search_terms:
+        search_url = f"https://www.goodreads.com/search?q={term}+{genre_name}"
+        yield f'search {term}', [f"{search_url}&page={page}" for page in range(1, 6)], {'settle': (1, 2), 'wait_for_body': False}
+
+def fetch_book_links(browser, page_url, limiter=None, settle=(1, 2), wait_for_body=True):
+    polite_get(browser, page_url, limiter)
+    if wait_for_body:
+        WebDriverWait(browser, 15).until(
+            EC.presence_of_element_located((By.TAG_NAME, "body"))
+        )
+    time.sleep(random.uniform(*settle))
+    # One page_source transfer instead of a WebDriver round trip per anchor
+    return extract_book_links(browser.page_source, page_url)
+
+def scrape_genre_extensively(browser, genre_url, target_books=600, limiter=None, frontier=None):
+    """Enhanced scraping with multiple strategies to get more books.
+    Books and pages already in ``frontier`` (e.g. from other genres) are skipped."""
+    genre_name = genre_url.split('/')[-1]
+    frontier = frontier or CrawlFrontier()
     
-    # Strategy 3: Search within genre if still need more
-    if len(book_urls) < target_books:
-        logger.info(f"🔥 Strategy 3: Search within genre (current: {len(book_urls)})")
-        
-        search_terms = [
-            "award", "bestseller", "popular", "classic", "novel", "fiction",
-            "mystery", "thriller", "romance", "adventure", "series", "book"
-        ]
-        
-        for term in search_terms:
-            if len(book_urls) >= target_books:
-                break
-                
-            try:
-                search_url = f"https://www.goodreads.com/search?q={term}+{genre_name}"
-                logger.info(f"🔍 Searching: {term}")
-                
-                for page in range(1, 6):  # 5 pages per search term
-                    try:
-                        url = f"{search_url}&page={page}"
-                        browser.get(url)
-                        time.sleep(random.uniform(1, 2))
-                        
-                        elements = browser.find_elements(By.CSS_SELECTOR, 'a[href*="/book/show/"]')
-                        
-                        for element in elements:
-                            try:
-                                url = element.get_attribute('href')
-                                if url and '/book/show/' in url:
-                                    clean_url = url.split('?')[0].split('#')[0]
-                                    book_urls.add(clean_url)
-                                    
-                                    if len(book_urls) >= target_books:
-                                        break
-                            except:
-                                continue
-                        
-                        if len(book_urls) >= target_books:
-                            break
-                            
-                    except:
-                        continue
-                        
-            except Exception as e:
-                continue
+    logger.info(f"📚 Starting extensive scraping of {genre_name} (target: {target_books} books)")
     
-    final_urls = list(book_urls)
+    final_urls = frontier.crawl(
+        genre_strategies(genre_url),
+        functools.partial(fetch_book_links, browser, limiter=limiter),
+        owner=genre_url,
+        target=target_books,
+    )
     logger.info(f"🎉 Finished scraping {genre_name}: {len(final_urls)} books collected")
     return final_urls
 
-def scrape_all_genres_extensively(browser, target_books_per_genre=600):
-    """Scrape multiple genres extensively"""
-    all_books_by_genre = {}
+def scrape_one_genre(pool, genre_url, target_books_per_genre=600, state=None, writer=None, limiter=None, frontier=None,
+                     run_id=None):
+    """Crawl (or restore from ``state``) one genre and save it as this run's part; returns its book URLs"""
+    genre_name = genre_url.split('/')[-1]
+    if state is not None and state.status(genre_url) == 'done':
+        genre_books = state.record(genre_url)
+        logger.info(f"⏭️ {genre_name}: {len(genre_books)} books restored from {state.path}")
+        return genre_books
     
-    logger.info(f"🌟 Starting extensive scraping of {len(genre_urls)} genres")
+    try:
+        # A browser that died during the genre is replaced on checkin
+        with pool.browser() as browser:
+            genre_books = scrape_genre_extensively(browser, genre_url, target_books_per_genre, limiter, frontier)
+        if state is not None:
+            state.mark_done(genre_url, genre_books, kind='genre')
+        if frontier is not None:
+            frontier.commit(genre_url)
+        
+        logger.info(f"✅ {genre_name}: {len(genre_books)} books collected")
+        
+        # Save progress after each genre
+        if writer is not None:
+            save_progress(genre_name, genre_books, writer, run_id)
+        
+        # Check if we achieved target
+        if len(genre_books) >= target_books_per_genre:
+            logger.info(f"🎯 TARGET ACHIEVED for {genre_name}!")
+        else:
+            logger.warning(f"⚠️ Only got {len(genre_books)}/{target_books_per_genre} for {genre_name}")
+        return genre_books
+        
+    except Exception as e:
+        logger.error(f"❌ Failed to scrape genre {genre_name}: {str(e)}")
+        if state is not None:
+            state.mark_failed(genre_url, str(e), kind='genre')
+        if frontier is not None:
+            frontier.release(genre_url)
+        return []
+
+def scrape_all_genres_extensively(pool, target_books_per_genre=600, state=None, writer=None, workers=1, limiter=None,
+                                  frontier=None, run_id=None):
+    """Scrape multiple genres extensively on browsers from ``pool``.
+    Genres already finished in ``state`` are restored instead of crawled again.
+    With ``workers`` > 1 genres are crawled in parallel; ``limiter`` then keeps
+    the combined page rate within budget instead of the pauses between genres."""
+    logger.info(f"🌟 Starting extensive scraping of {len(genre_urls)} genres on {workers} workers")
     logger.info(f"🎯 Target: {target_books_per_genre} books per genre")
     
+    crawl = functools.partial(scrape_one_genre, pool, target_books_per_genre=target_books_per_genre,
+                              state=state, writer=writer, limiter=limiter, frontier=frontier, run_id=run_id)
+    
+    if workers > 1:
+        # Each genre has its own result list, merged here in the main thread only
+        results = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(crawl, genre_url): genre_url for genre_url in genre_urls}
+            for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                genre_url = futures[future]
+                results[genre_url] = future.result()
+                logger.info(f"📖 {done}/{len(genre_urls)} genres finished ({genre_url.split('/')[-1]})")
+        return {genre_url.split('/')[-1]: results[genre_url] for genre_url in genre_urls}
+    
+    all_books_by_genre = {}
     for i, genre_url in enumerate(genre_urls, 1):
         genre_name = genre_url.split('/')[-1]
         logger.info(f"\n{'='*60}")
         logger.info(f"📖 PROCESSING GENRE {i}/{len(genre_urls)}: {genre_name.upper()}")
         logger.info(f"{'='*60}")
         
-        try:
-            genre_books = scrape_genre_extensively(browser, genre_url, target_books_per_genre)
-            all_books_by_genre[genre_name] = genre_books
-            
-            logger.info(f"✅ {genre_name}: {len(genre_books)} books collected")
-            
-            # Save progress after each genre
-            save_progress(all_books_by_genre)
-            
-            # Check if we achieved target
-            if len(genre_books) >= target_books_per_genre:
-                logger.info(f"🎯 TARGET ACHIEVED for {genre_name}!")
-            else:
-                logger.warning(f"⚠️ Only got {len(genre_books)}/{target_books_per_genre} for {genre_name}")
-            
-            # Longer delay between genres
-            if i < len(genre_urls):
-                delay = random.uniform(5, 10)
-                logger.info(f"⏳ Waiting {delay:.1f} seconds before next genre...")
-                time.sleep(delay)
-                
-        except Exception as e:
-            logger.error(f"❌ Failed to scrape genre {genre_name}: {str(e)}")
-            all_books_by_genre[genre_name] = []
-            continue
+        restored = state is not None and state.status(genre_url) == 'done'
+        all_books_by_genre[genre_name] = crawl(genre_url)
+        
+        # Longer delay between genres
+        if i < len(genre_urls) and not restored:
+            delay = random.uniform(5, 10)
+            logger.info(f"⏳ Waiting {delay:.1f} seconds before next genre...")
+            time.sleep(delay)
     
     return all_books_by_genre
 
-def save_progress(all_books_by_genre):
-    """Save progress to CSV files"""
+def save_progress(genre_name, book_urls, writer, run_id=None):
+    """Save one finished genre: rows appended to its own CSV plus a Parquet part for the combined file.
+    The part is named after the genre and ``run_id``, so a later run adds a part instead of
+    overwriting the URLs an earlier run collected for the genre."""
     try:
-        # Save individual genre files
-        for genre_name, book_urls in all_books_by_genre.items():
-            if book_urls:
-                df = pd.DataFrame({
-                    'book_url': book_urls,
-                    'genre': genre_name
-                })
-                filename = f'book_urls_{genre_name}.csv'
-                df.to_csv(filename, index=False)
-                logger.info(f"💾 Saved {len(book_urls)} URLs for {genre_name} to {filename}")
-        
-        # Save combined file
-        all_urls = []
-        for genre_name, urls in all_books_by_genre.items():
-            for url in urls:
-                all_urls.append({'book_url': url, 'genre': genre_name})
-        
-        if all_urls:
-            combined_df = pd.DataFrame(all_urls)
-            combined_df.to_csv('all_book_urls_combined.csv', index=False)
-            logger.info(f"💾 Saved combined file with {len(all_urls)} total URLs")
+        if book_urls:
+            df = pd.DataFrame({
+                'book_url': book_urls,
+                'genre': genre_name
+            })
+            filename = f'book_urls_{genre_name}.csv'
+            df.to_csv(filename, mode='a', header=not os.path.exists(filename), index=False)
+            run_id = run_id or time.strftime('%Y%m%d-%H%M%S')
+            writer.append(df.to_dict('records'), name=f'{genre_name}-{run_id}')
+            logger.info(f"💾 Saved {len(book_urls)} URLs for {genre_name} to {filename}")
             
     except Exception as e:
         logger.error(f"❌ Error saving progress: {str(e)}")
 
 def main():
     """Main function to scrape 600+ books per genre"""
-    browser = None
+    parser = argparse.ArgumentParser(description="Collect Goodreads book URLs from genre shelves")
+    parser.add_argument('--target', type=int, default=600, help="books per genre")
+    parser.add_argument('--workers', type=int, default=1, help="genres crawled in parallel, one browser each")
+    parser.add_argument('--rate', type=float, default=1.0, help="page loads per second across all workers")
+    parser.add_argument('--frontier', default='crawl_frontier.npz', help="seen book/page hashes kept between runs")
+    parser.add_argument('--page-ttl', type=float, default=24,
+                        help="hours a listing page loaded in an earlier run is skipped (0: only within this run)")
+    args = parser.parse_args()
+    
+    pool = BrowserPool(setup_driver, size=args.workers)
+    limiter = TokenBucket(args.rate)
+    state = ScrapeState('scrape_state.sqlite')
     
     try:
-        # Setup driver
-        browser = setup_driver()
-        
         # Test basic functionality
         logger.info("🧪 Testing basic navigation...")
-        browser.get("https://www.goodreads.com")
-        time.sleep(3)
+        with pool.browser() as browser:
+            browser.get("https://www.goodreads.com")
+            time.sleep(3)
         logger.info("✅ Basic navigation successful!")
         
         # Start extensive scraping
-        target_books = 600  # Target 600 books per genre
-        all_books_by_genre = scrape_all_genres_extensively(browser, target_books)
+        target_books = args.target
+        writer = PartWriter('book_urls_parts', URL_SCHEMA)
+        frontier = CrawlFrontier(args.frontier, page_ttl=args.page_ttl * 3600)
+        run_id = time.strftime('%Y%m%d-%H%M%S')
+        all_books_by_genre = scrape_all_genres_extensively(pool, target_books, state, writer, args.workers, limiter, frontier,
+                                                           run_id)
+        total_urls = writer.finalize(csv_path='all_book_urls_combined.csv')
+        logger.info(f"💾 Saved combined file with {total_urls} total URLs")
         
         # Final summary
         logger.info("\n" + "="*70)
@@ -357,6 +301,8 @@ def main():
         
         logger.info(f"\n🎉 TOTAL BOOKS COLLECTED: {total_books}")
         logger.info(f"📈 Average per genre: {total_books/len(genre_urls):.0f}")
+        crawl_stats = frontier.stats()
+        logger.info(f"📄 Page loads per unique book: {crawl_stats['pages_per_unique_book']:.3f} ({crawl_stats})")
         
         # Display sample URLs
         print("\n" + "="*50)
@@ -376,13 +322,10 @@ def main():
         logger.error(f"📋 Full traceback: {traceback.format_exc()}")
         
     finally:
-        if browser:
-            logger.info("🔒 Closing browser...")
-            try:
-                browser.quit()
-                logger.info("✅ Browser closed successfully")
-            except:
-                logger.warning("⚠️ Error closing browser, but continuing...")
+        logger.info("🔒 Closing browser...")
+        pool.close()
+        state.close()
+        logger.info(f"✅ Browser pool closed: {pool.stats}")
 
 if __name__ == "__main__":
     main()
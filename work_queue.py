@@ -0,0 +1,88 @@
+import itertools
+import logging
+import queue
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class WorkQueue:
+    """Shared queue that worker threads pull items from one at a time.
+
+    ``handler(item)`` returns a result; an exception or a ``None`` result is a failed
+    attempt. Failed items go back on the queue after an exponential backoff (with
+    jitter) and land in ``dead_letters`` after ``max_attempts``. A slow item only
+    holds up the worker handling it, so wall-clock time follows the total work.
+    """
+
+    def __init__(self, items, max_attempts=3, backoff=2.0, max_backoff=60.0, log_every=20, clock=time.monotonic):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.log_every = log_every
+        self.clock = clock
+        self.total = len(items)
+        self.results = []
+        self.dead_letters = []
+        self.retries = 0
+        self._remaining = len(items)
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        for item in items:
+            self._put(item, 0, 0.0)
+
+    def _put(self, item, attempt, ready_at):
+        # Ordered by ready time, then FIFO; the counter keeps items themselves uncompared
+        self._queue.put((ready_at, next(self._order), attempt, item))
+
+    def _finish(self, result=None, dead_letter=None):
+        with self._lock:
+            if dead_letter is None:
+                self.results.append(result)
+            else:
+                self.dead_letters.append(dead_letter)
+            self._remaining -= 1
+            done = self.total - self._remaining
+        if self.log_every and done % self.log_every == 0:
+            logger.info(f"Progress: {done}/{self.total} - OK: {len(self.results)} - Retries: {self.retries} - Dead: {len(self.dead_letters)}")
+
+    def _worker(self, handler):
+        while True:
+            with self._lock:
+                if not self._remaining:
+                    return
+            try:
+                ready_at, _, attempt, item = self._queue.get(timeout=0.2)
+            except queue.Empty:
+                continue  # the last items are in flight elsewhere and may still be retried
+            wait = ready_at - self.clock()
+            if wait > 0:
+                time.sleep(wait)
+
+            try:
+                result = handler(item)
+                error = None if result is not None else 'no result'
+            except Exception as e:
+                result, error = None, str(e)
+
+            if error is None:
+                self._finish(result)
+            elif attempt + 1 < self.max_attempts:
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.5)
+                with self._lock:
+                    self.retries += 1
+                self._put(item, attempt + 1, self.clock() + delay)
+            else:
+                self._finish(dead_letter={'item': item, 'attempts': attempt + 1, 'error': error})
+
+    def run(self, handler, num_workers=4):
+        """Process every item with ``num_workers`` threads; returns the results in completion order"""
+        workers = [threading.Thread(target=self._worker, args=(handler,), daemon=True) for _ in range(num_workers)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return self.results